@@ -1,19 +1,18 @@
-import json
-import logging
+import orjson
 import threading
 # 导入日志配置来修复Windows控制台编码问题
 import logging_config
-from flask import Flask, jsonify, request, session
+from flask import Flask, Response, jsonify, request, session
 from flask_cors import CORS
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from functools import wraps
 from datetime import datetime, timedelta
-from services.stock_service import get_stock_price, search_stocks, search_stocks_by_keyword, validate_tushare_token
+from services.stock_service import get_stock_price, search_stocks_by_keyword, validate_tushare_token
 from services.watchlist_service import get_watchlist, add_stock, remove_stock, update_stock_thresholds
 from services.monitor_service import check_thresholds, format_alert_message, check_and_get_alerts
 from services.alert_manager import reset_alert
-from services.database_service import get_alert_logs, get_alert_logs_count, init_database
+from services.database_service import get_alert_logs_page, init_database, optimize_database
 from services.auth_service import (
     init_user_database, register_user, authenticate_user, 
     get_user_by_id, get_user_config, get_user_config_summary, 
@@ -443,12 +442,13 @@ def stock_search():
         app.logger.info(f"格式化结果完成，返回 {len(formatted_results)} 个结果")
         app.logger.info("=== 股票搜索API成功结束 ===")
         
-        return jsonify({
+        # 搜索接口调用频繁（输入联想），使用orjson直接序列化为UTF-8，跳过标准库json的转义
+        return Response(orjson.dumps({
             "query": query,
             "count": len(formatted_results),
             "results": formatted_results,
             "message": search_result['message']
-        })
+        }), mimetype='application/json')
         
     except Exception as e:
         app.logger.error(f"股票搜索出错: {e}")
@@ -857,8 +857,8 @@ def get_alert_log():
             except ValueError:
                 return jsonify({"error": "end_date 格式错误，应为 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM:SS"}), 400
         
-        # 查询告警日志
-        logs = get_alert_logs(
+        # 查询告警日志及总数（单条语句）
+        logs, total_count = get_alert_logs_page(
             user_email=user_email,
             stock_code=stock_code,
             start_date=start_datetime,
@@ -867,14 +867,6 @@ def get_alert_log():
             offset=offset
         )
         
-        # 获取总数用于分页
-        total_count = get_alert_logs_count(
-            user_email=user_email,
-            stock_code=stock_code,
-            start_date=start_datetime,
-            end_date=end_datetime
-        )
-        
         # 计算分页信息
         total_pages = (total_count + page_size - 1) // page_size
         
@@ -928,6 +920,15 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # 每15分钟执行一次 PRAGMA optimize，保持查询统计信息新鲜
+    scheduler.add_job(
+        func=optimize_database,
+        trigger=IntervalTrigger(minutes=15),
+        id='optimize_database_job',
+        name='数据库查询优化',
+        replace_existing=True
+    )
+    
     # 启动调度器
     scheduler.start()
     app.logger.info("股票价格监控定时任务已启动")
@@ -8,7 +8,7 @@ import sys
 import logging
 from services.auth_service import get_user_config_by_email
 from services.monitor_service import get_watchlist
-from services.stock_service import get_stock_price
+from services.stock_service import get_stock_price, clear_stock_list_cache
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,9 +20,7 @@ def restart_monitor_service():
     
     # 1. 清除可能的股票列表缓存
     try:
-        import services.stock_service as stock_service
-        stock_service._cached_stock_list = None
-        stock_service._cache_timestamp = None
+        clear_stock_list_cache()
         print("   ✓ 已清除股票列表缓存")
     except Exception as e:
         print(f"   ⚠ 清除缓存时出错: {e}")
@@ -1,11 +1,11 @@
 import json
-import requests
 from typing import Optional, Dict, Any, List, Tuple
 import logging
 import re
 import google.generativeai as genai # 导入Gemini SDK
 import os # 用于设置代理环境变量
 from google.api_core import exceptions as google_api_exceptions # 导入Google API核心异常
+from .http_client import get_session
 
 # 日志配置
 logger = logging.getLogger('ai_analysis_service')
@@ -128,7 +128,7 @@ def get_ai_analysis(stock_code: str, current_price: float, llm_preference: str,
         else:
             # 尝试从watchlist获取股票名称
             try:
-                from .stock_service import get_watchlist
+                from .watchlist_service import get_watchlist
                 watchlist = get_watchlist()
                 for stock in watchlist:
                     if stock.get('stock_code') == stock_code:
@@ -291,7 +291,7 @@ def _analyze_with_openai(stock_code: str, stock_name: str, current_price: float,
             "max_tokens": 15000
         }
         
-        response = requests.post(OPENAI_API_URL, headers=headers, json=payload, timeout=30, proxies=proxies)
+        response = get_session().post(OPENAI_API_URL, headers=headers, json=payload, timeout=30, proxies=proxies)
         
         if response.status_code == 200:
             result = response.json()
@@ -593,7 +593,7 @@ def _analyze_with_deepseek(stock_code: str, stock_name: str, current_price: floa
             "max_tokens": 1500
         }
         
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=30, proxies=proxies)
+        response = get_session().post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=30, proxies=proxies)
         
         if response.status_code == 200:
             result = response.json()
@@ -7,7 +7,11 @@ from datetime import datetime, timedelta
 logger = logging.getLogger('alert_manager')
 
 # 警报状态文件路径
-ALERTS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'alerts_status.json')
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+ALERTS_FILE = os.path.join(DATA_DIR, 'alerts_status.json')
+
+# 确保数据目录存在（导入时执行一次）
+os.makedirs(DATA_DIR, exist_ok=True)
 
 def load_alerts_status():
     """
@@ -33,9 +37,6 @@ def save_alerts_status(alerts_status):
     alerts_status (dict): 警报状态记录
     """
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(ALERTS_FILE), exist_ok=True)
-        
         with open(ALERTS_FILE, 'w', encoding='utf-8') as f:
             json.dump(alerts_status, f, ensure_ascii=False, indent=2)
     except Exception as e:
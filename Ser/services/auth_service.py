@@ -4,91 +4,235 @@
 """
 
 import sqlite3
-import os
+import copy
+import json
 import logging
+import hashlib
+import threading
+import time
 from typing import Optional, Dict, Any
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from werkzeug.security import check_password_hash as _werkzeug_check_password_hash
+from datetime import datetime, timezone
+from .db_pool import get_conn
 from .encryption_service import encrypt_string, decrypt_string, encrypt_json, decrypt_json
 
 logger = logging.getLogger('auth_service')
 
-# 数据库文件路径
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'stock_monitor.db')
+# 用户表结构只需在进程内初始化一次（应用启动时调用 init_user_database）
+_INIT_DONE = False
+_INIT_LOCK = threading.Lock()
+
+# Argon2 密码哈希器（原生实现，替代 werkzeug 的 pbkdf2），首次使用时按本机性能校准迭代次数
+_PASSWORD_HASHER: Optional[PasswordHasher] = None
+_PASSWORD_HASHER_LOCK = threading.Lock()
+_PASSWORD_HASH_TARGET_SECONDS = 0.1  # 单次哈希目标耗时
+_PASSWORD_HASH_MIN_TIME_COST = 2
+_PASSWORD_HASH_MAX_TIME_COST = 10
+
+# 用户不存在时用于校验的占位哈希，使"用户不存在"与"密码错误"耗时一致，避免通过响应时间枚举用户名
+_DUMMY_PASSWORD_HASH: Optional[str] = None
+
+# 登录结果缓存：(用户名, 密码摘要) -> (过期时间, 用户信息)，避免短时间内重复执行密码哈希校验
+_AUTH_CACHE: Dict[tuple, tuple] = {}
+_AUTH_CACHE_LOCK = threading.Lock()
+_AUTH_CACHE_TTL = 300  # 秒
+_AUTH_CACHE_MAXSIZE = 4096
+
+# 用户配置缓存：(类型, 用户ID) -> (过期时间, 配置)，避免每个请求都查库并解密；配置更新时按用户失效
+_CONFIG_CACHE: Dict[tuple, tuple] = {}
+_CONFIG_CACHE_LOCK = threading.Lock()
+_CONFIG_CACHE_TTL = 300  # 秒
+_CONFIG_CACHE_MAXSIZE = 1024
+
+# 预定义的SQL语句（文本固定，便于SQLite按语句文本复用已编译的语句缓存）
+_SELECT_LOGIN_USER_SQL = '''
+    SELECT * FROM users 
+    WHERE (username = ? OR email = ?) AND is_active = 1
+'''
+
+_SELECT_USER_ACTIVE_SQL = 'SELECT 1 FROM users WHERE id = ? AND is_active = 1'
+
+_INSERT_USER_SQL = '''
+    INSERT INTO users (username, email, password_hash)
+    VALUES (?, ?, ?)
+'''
+
+_SELECT_USER_BY_ID_SQL = '''
+    SELECT id, username, email, created_at, updated_at
+    FROM users 
+    WHERE id = ? AND is_active = 1
+'''
+
+_USER_CONFIG_COLUMNS = '''
+    id, tushare_token, email_sender_address, email_smtp_server, 
+    email_smtp_port, email_smtp_user, email_smtp_password_encrypted,
+    ai_api_keys_json_encrypted, ai_configurations_json_encrypted,
+    proxy_settings_json_encrypted, preferred_llm, updated_at
+'''
+
+_SELECT_USER_CONFIG_SQL = f'''
+    SELECT {_USER_CONFIG_COLUMNS}
+    FROM users 
+    WHERE id = ? AND is_active = 1
+'''
+
+_SELECT_USER_CONFIG_BY_EMAIL_SQL = f'''
+    SELECT {_USER_CONFIG_COLUMNS}
+    FROM users 
+    WHERE email = ? AND is_active = 1
+'''
+
+_SELECT_USER_CONFIG_SUMMARY_SQL = '''
+    SELECT tushare_token, email_sender_address, email_smtp_server, 
+           email_smtp_port, email_smtp_user, email_smtp_password_encrypted,
+           ai_api_keys_json_encrypted, ai_configurations_json_encrypted,
+           proxy_settings_json_encrypted, preferred_llm,
+           ai_keys_configured, ai_providers_configured, proxy_has_config, proxy_enabled
+    FROM users 
+    WHERE id = ? AND is_active = 1
+'''
+
+_SELECT_PASSWORD_HASH_SQL = 'SELECT password_hash FROM users WHERE id = ?'
+
+_UPDATE_PASSWORD_SQL = '''
+    UPDATE users 
+    SET password_hash = ?, updated_at = CURRENT_TIMESTAMP 
+    WHERE id = ?
+'''
+
+# update_user_config 可更新的列，按此固定顺序生成SQL
+_CONFIG_UPDATE_COLUMNS = (
+    'tushare_token', 'email_sender_address', 'email_smtp_server', 'email_smtp_port',
+    'email_smtp_user', 'email_smtp_password_encrypted', 'ai_api_keys_json_encrypted',
+    'ai_configurations_json_encrypted', 'proxy_settings_json_encrypted', 'preferred_llm',
+    'ai_keys_configured', 'ai_providers_configured', 'proxy_has_config', 'proxy_enabled',
+)
+
+# 按更新字段组合缓存的UPDATE语句
+_UPDATE_SQL_CACHE: Dict[frozenset, str] = {}
+
+def _get_config_update_sql(columns: frozenset) -> str:
+    """
+    获取更新指定列组合的UPDATE语句
+    
+    同一组合始终生成同一条SQL文本，从而命中连接上的预编译语句缓存
+    """
+    sql = _UPDATE_SQL_CACHE.get(columns)
+    if sql is None:
+        assignments = [f'{column} = ?' for column in _CONFIG_UPDATE_COLUMNS if column in columns]
+        assignments.append('updated_at = CURRENT_TIMESTAMP')
+        sql = f"UPDATE users SET {', '.join(assignments)} WHERE id = ?"
+        _UPDATE_SQL_CACHE[columns] = sql
+    return sql
+
+def _mask_sensitive_value(value: str) -> str:
+    """对敏感信息进行掩码处理（保留首尾各4位）"""
+    if not value:
+        return ''
+    if len(value) <= 8:
+        return '*' * len(value)
+    return f"{value[:4]}{'*' * (len(value) - 8)}{value[-4:]}"
+
+def _mask_field(mapping: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """返回 field 已掩码的字典；字段为空时直接返回原字典，避免无谓的复制"""
+    value = mapping.get(field)
+    if not value:
+        return mapping
+    return {**mapping, field: _mask_sensitive_value(value)}
 
 def init_user_database():
     """
     初始化用户数据库表
     """
-    try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        
-        # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # 创建用户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                tushare_token TEXT,
-                email_sender_address TEXT,
-                email_smtp_server TEXT,
-                email_smtp_port INTEGER DEFAULT 587,
-                email_smtp_user TEXT,
-                email_smtp_password_encrypted TEXT,
-                ai_api_keys_json_encrypted TEXT,
-                ai_configurations_json_encrypted TEXT,
-                proxy_settings_json_encrypted TEXT,
-                preferred_llm TEXT DEFAULT 'openai',
-                is_active BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 检查是否需要添加新字段（用于数据库升级）
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'preferred_llm' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN preferred_llm TEXT DEFAULT "openai"')
-            logger.info("已添加preferred_llm字段到用户表")
-        
-        if 'ai_configurations_json_encrypted' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN ai_configurations_json_encrypted TEXT')
-            logger.info("已添加ai_configurations_json_encrypted字段到用户表")
-        
-        if 'proxy_settings_json_encrypted' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN proxy_settings_json_encrypted TEXT')
-            logger.info("已添加proxy_settings_json_encrypted字段到用户表")
-        
-        # 创建索引
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_users_username 
-            ON users(username)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_users_email 
-            ON users(email)
-        ''')
-        
-        # 提交更改
-        conn.commit()
-        
-        logger.info("用户数据库表初始化成功")
-        
-    except Exception as e:
-        logger.error(f"用户数据库表初始化失败: {e}")
-        raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
+    global _INIT_DONE
+    if _INIT_DONE:
+        return
+    
+    with _INIT_LOCK:
+        if _INIT_DONE:
+            return
+        
+        try:
+            # 连接数据库
+            conn = get_conn()
+            cursor = conn.cursor()
+            
+            # 建表、升级检查与索引在同一个事务中完成，只提交（落盘）一次
+            with conn:
+                cursor.execute('BEGIN IMMEDIATE')
+                
+                # 创建用户表
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        email TEXT UNIQUE NOT NULL,
+                        password_hash TEXT NOT NULL,
+                        tushare_token TEXT,
+                        email_sender_address TEXT,
+                        email_smtp_server TEXT,
+                        email_smtp_port INTEGER DEFAULT 587,
+                        email_smtp_user TEXT,
+                        email_smtp_password_encrypted TEXT,
+                        ai_api_keys_json_encrypted TEXT,
+                        ai_configurations_json_encrypted TEXT,
+                        proxy_settings_json_encrypted TEXT,
+                        preferred_llm TEXT DEFAULT 'openai',
+                        ai_keys_configured TEXT,
+                        ai_providers_configured TEXT,
+                        proxy_has_config INTEGER,
+                        proxy_enabled INTEGER,
+                        is_active BOOLEAN DEFAULT 1,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # 检查是否需要添加新字段（用于数据库升级）
+                cursor.execute("PRAGMA table_info(users)")
+                columns = [column[1] for column in cursor.fetchall()]
+                
+                if 'preferred_llm' not in columns:
+                    cursor.execute('ALTER TABLE users ADD COLUMN preferred_llm TEXT DEFAULT "openai"')
+                    logger.info("已添加preferred_llm字段到用户表")
+                
+                if 'ai_configurations_json_encrypted' not in columns:
+                    cursor.execute('ALTER TABLE users ADD COLUMN ai_configurations_json_encrypted TEXT')
+                    logger.info("已添加ai_configurations_json_encrypted字段到用户表")
+                
+                if 'proxy_settings_json_encrypted' not in columns:
+                    cursor.execute('ALTER TABLE users ADD COLUMN proxy_settings_json_encrypted TEXT')
+                    logger.info("已添加proxy_settings_json_encrypted字段到用户表")
+                
+                # 配置摘要字段（非敏感信息，供摘要接口直接读取而无需解密）
+                for column_name, column_type in (('ai_keys_configured', 'TEXT'),
+                                                 ('ai_providers_configured', 'TEXT'),
+                                                 ('proxy_has_config', 'INTEGER'),
+                                                 ('proxy_enabled', 'INTEGER')):
+                    if column_name not in columns:
+                        cursor.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_type}')
+                        logger.info(f"已添加{column_name}字段到用户表")
+                
+                # 创建索引
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_username 
+                    ON users(username)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_email 
+                    ON users(email)
+                ''')
+            
+            logger.info("用户数据库表初始化成功")
+            
+            _INIT_DONE = True
+            
+        except Exception as e:
+            logger.error(f"用户数据库表初始化失败: {e}")
+            raise
 
 def register_user(username: str, email: str, password: str) -> tuple[bool, str]:
     """
@@ -103,34 +247,23 @@ def register_user(username: str, email: str, password: str) -> tuple[bool, str]:
     tuple: (成功标志, 消息)
     """
     try:
-        # 确保数据库已初始化
-        init_user_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
         
-        # 检查用户名是否已存在
-        cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
-        if cursor.fetchone():
-            return False, "用户名已存在"
-        
-        # 检查邮箱是否已存在
-        cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        if cursor.fetchone():
-            return False, "邮箱已被注册"
-        
         # 生成密码哈希
         password_hash = generate_password_hash(password)
         
-        # 插入新用户
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash)
-            VALUES (?, ?, ?)
-        ''', (username, email, password_hash))
-        
-        # 提交更改
-        conn.commit()
+        # 直接插入新用户，由UNIQUE约束判断用户名/邮箱是否已存在（with 块结束时提交）
+        try:
+            with conn:
+                cursor.execute(_INSERT_USER_SQL, (username, email, password_hash))
+        except sqlite3.IntegrityError as e:
+            if 'users.username' in str(e):
+                return False, "用户名已存在"
+            if 'users.email' in str(e):
+                return False, "邮箱已被注册"
+            raise
         
         logger.info(f"用户注册成功: {username} ({email})")
         return True, "注册成功"
@@ -138,9 +271,98 @@ def register_user(username: str, email: str, password: str) -> tuple[bool, str]:
     except Exception as e:
         logger.error(f"用户注册失败: {e}")
         return False, "注册失败，请稍后重试"
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def _calibrate_password_hasher() -> PasswordHasher:
+    """
+    校准 Argon2 的 time_cost，使单次哈希耗时接近 _PASSWORD_HASH_TARGET_SECONDS
+    
+    耗时过短会降低暴力破解成本，过长则白白占用登录时的CPU
+    """
+    probe = PasswordHasher()
+    start = time.perf_counter()
+    probe.hash('calibration')
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    
+    time_cost = round(probe.time_cost * _PASSWORD_HASH_TARGET_SECONDS / elapsed)
+    time_cost = min(max(time_cost, _PASSWORD_HASH_MIN_TIME_COST), _PASSWORD_HASH_MAX_TIME_COST)
+    logger.info(f"密码哈希参数校准完成: time_cost={time_cost}, 基准耗时={elapsed * 1000:.0f}ms")
+    return PasswordHasher(time_cost=time_cost)
+
+def _get_password_hasher() -> PasswordHasher:
+    """获取（首次调用时校准的）Argon2 密码哈希器"""
+    global _PASSWORD_HASHER, _DUMMY_PASSWORD_HASH
+    if _PASSWORD_HASHER is None:
+        with _PASSWORD_HASHER_LOCK:
+            if _PASSWORD_HASHER is None:
+                hasher = _calibrate_password_hasher()
+                _DUMMY_PASSWORD_HASH = hasher.hash('dummy-password')
+                _PASSWORD_HASHER = hasher
+    return _PASSWORD_HASHER
+
+def _get_dummy_password_hash() -> str:
+    """获取占位密码哈希（与真实哈希使用相同参数）"""
+    _get_password_hasher()
+    return _DUMMY_PASSWORD_HASH
+
+def generate_password_hash(password: str) -> str:
+    """
+    生成密码哈希（Argon2id）
+    
+    参数:
+    password (str): 明文密码
+    
+    返回:
+    str: 密码哈希
+    """
+    return _get_password_hasher().hash(password)
+
+def check_password_hash(password_hash: str, password: str) -> bool:
+    """
+    校验密码，兼容旧版 werkzeug 生成的哈希
+    
+    参数:
+    password_hash (str): 数据库中保存的密码哈希
+    password (str): 明文密码
+    
+    返回:
+    bool: 密码是否正确
+    """
+    if not password_hash.startswith('$argon2'):
+        return _werkzeug_check_password_hash(password_hash, password)
+    try:
+        return _get_password_hasher().verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def _auth_cache_key(username: str, password: str) -> tuple:
+    """生成登录缓存键，缓存中不保存明文密码"""
+    return (username, hashlib.sha256(password.encode('utf-8')).hexdigest())
+
+def _auth_cache_get(key: tuple) -> Optional[Dict[str, Any]]:
+    """读取未过期的登录缓存"""
+    with _AUTH_CACHE_LOCK:
+        entry = _AUTH_CACHE.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _AUTH_CACHE[key]
+            return None
+        return dict(entry[1])
+
+def _auth_cache_put(key: tuple, user_info: Dict[str, Any]) -> None:
+    """写入登录缓存，超出容量时淘汰最早写入的条目"""
+    with _AUTH_CACHE_LOCK:
+        _AUTH_CACHE.pop(key, None)
+        while len(_AUTH_CACHE) >= _AUTH_CACHE_MAXSIZE:
+            del _AUTH_CACHE[next(iter(_AUTH_CACHE))]
+        _AUTH_CACHE[key] = (time.monotonic() + _AUTH_CACHE_TTL, dict(user_info))
+
+def _auth_cache_invalidate_user(user_id: int) -> None:
+    """清除指定用户的全部登录缓存（修改密码后调用）"""
+    with _AUTH_CACHE_LOCK:
+        stale_keys = [key for key, entry in _AUTH_CACHE.items() if entry[1]['id'] == user_id]
+        for key in stale_keys:
+            del _AUTH_CACHE[key]
 
 def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
     """
@@ -153,23 +375,29 @@ def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
     返回:
     dict: 用户信息（不包含密码），如果验证失败返回None
     """
+    cache_key = _auth_cache_key(username, password)
+    cached_user = _auth_cache_get(cache_key)
+    
     try:
-        # 确保数据库已初始化
-        init_user_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
+        # 短时间内重复登录使用缓存结果，跳过密码哈希校验；
+        # 仍按主键确认账号未被停用（停用的账号在缓存有效期内也不能登录）
+        if cached_user is not None:
+            if conn.execute(_SELECT_USER_ACTIVE_SQL, (cached_user['id'],)).fetchone():
+                return cached_user
+            _auth_cache_invalidate_user(cached_user['id'])
+            return None
+        
         # 查找用户（支持用户名或邮箱登录）
-        cursor.execute('''
-            SELECT * FROM users 
-            WHERE (username = ? OR email = ?) AND is_active = 1
-        ''', (username, username))
+        cursor.execute(_SELECT_LOGIN_USER_SQL, (username, username))
         
         user_row = cursor.fetchone()
         if not user_row:
+            # 用户不存在时仍执行一次同等代价的哈希校验，保持响应耗时一致
+            check_password_hash(_get_dummy_password_hash(), password)
             return None
         
         # 验证密码
@@ -185,15 +413,15 @@ def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
             'updated_at': user_row['updated_at']
         }
         
+        # 仅缓存验证成功的结果
+        _auth_cache_put(cache_key, user_info)
+        
         logger.info(f"用户登录成功: {username}")
         return user_info
         
     except Exception as e:
         logger.error(f"用户验证失败: {e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -207,16 +435,11 @@ def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
     """
     try:
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 查找用户
-        cursor.execute('''
-            SELECT id, username, email, created_at, updated_at
-            FROM users 
-            WHERE id = ? AND is_active = 1
-        ''', (user_id,))
+        cursor.execute(_SELECT_USER_BY_ID_SQL, (user_id,))
         
         user_row = cursor.fetchone()
         if not user_row:
@@ -227,9 +450,96 @@ def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"获取用户信息失败: {e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def _row_to_user_config(config_row: sqlite3.Row) -> Dict[str, Any]:
+    """
+    将用户配置行解密并组装为用户配置字典
+    
+    参数:
+    config_row (sqlite3.Row): 按 _USER_CONFIG_COLUMNS 查询得到的行
+    
+    返回:
+    dict: 用户配置信息，包含解密后的敏感信息
+    """
+    user_id = config_row['id']
+    logger.debug("找到用户配置: user_id=%s, 最后更新=%s", user_id, config_row['updated_at'])
+    
+    # 解密敏感信息
+    email_password = None
+    if config_row['email_smtp_password_encrypted']:
+        email_password = decrypt_string(config_row['email_smtp_password_encrypted'])
+    
+    ai_api_keys = {}
+    if config_row['ai_api_keys_json_encrypted']:
+        ai_api_keys = decrypt_json(config_row['ai_api_keys_json_encrypted']) or {}
+    
+    ai_configurations = {}
+    if config_row['ai_configurations_json_encrypted']:
+        try:
+            ai_configurations = decrypt_json(config_row['ai_configurations_json_encrypted']) or {}
+            
+            # 详细记录每个提供商的配置状态（仅在调试级别下执行）
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"AI配置解密成功: user_id={user_id}, 提供商数量={len(ai_configurations)}")
+                for provider_id, provider_config in ai_configurations.items():
+                    has_api_key = bool(provider_config.get('api_key'))
+                    model = provider_config.get('model_id', 'N/A')
+                    enabled = provider_config.get('enabled', False)
+                    logger.debug(f"  提供商 {provider_id}: 模型={model}, 启用={enabled}, 有密钥={has_api_key}")
+                
+        except Exception as e:
+            logger.error(f"AI配置解密失败: user_id={user_id}, 错误={e}")
+            ai_configurations = {}
+    
+    proxy_settings = {}
+    if config_row['proxy_settings_json_encrypted']:
+        try:
+            proxy_settings = decrypt_json(config_row['proxy_settings_json_encrypted']) or {}
+            if proxy_settings and logger.isEnabledFor(logging.DEBUG):
+                proxy_enabled = proxy_settings.get('enabled', False)
+                proxy_host = proxy_settings.get('host', 'N/A')
+                logger.debug(f"代理设置: user_id={user_id}, 启用={proxy_enabled}, 主机={proxy_host}")
+        except Exception as e:
+            logger.error(f"代理设置解密失败: user_id={user_id}, 错误={e}")
+            proxy_settings = {}
+    
+    return {
+        'tushare_token': config_row['tushare_token'],
+        'email_sender_address': config_row['email_sender_address'],
+        'email_smtp_server': config_row['email_smtp_server'],
+        'email_smtp_port': config_row['email_smtp_port'],
+        'email_smtp_user': config_row['email_smtp_user'],
+        'email_smtp_password': email_password,
+        'ai_api_keys': ai_api_keys,
+        'ai_configurations': ai_configurations,
+        'proxy_settings': proxy_settings,
+        'preferred_llm': config_row['preferred_llm'] or 'openai'
+    }
+
+def _config_cache_get(key: tuple) -> Optional[Dict[str, Any]]:
+    """读取未过期的用户配置缓存（返回副本，调用方修改不影响缓存）"""
+    with _CONFIG_CACHE_LOCK:
+        entry = _CONFIG_CACHE.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _CONFIG_CACHE[key]
+            return None
+        return copy.deepcopy(entry[1])
+
+def _config_cache_put(key: tuple, config: Dict[str, Any]) -> None:
+    """写入用户配置缓存，超出容量时淘汰最早写入的条目"""
+    with _CONFIG_CACHE_LOCK:
+        _CONFIG_CACHE.pop(key, None)
+        while len(_CONFIG_CACHE) >= _CONFIG_CACHE_MAXSIZE:
+            del _CONFIG_CACHE[next(iter(_CONFIG_CACHE))]
+        _CONFIG_CACHE[key] = (time.monotonic() + _CONFIG_CACHE_TTL, copy.deepcopy(config))
+
+def _config_cache_invalidate(user_id: int) -> None:
+    """清除指定用户的全部配置缓存"""
+    with _CONFIG_CACHE_LOCK:
+        _CONFIG_CACHE.pop(('config', user_id), None)
+        _CONFIG_CACHE.pop(('summary', user_id), None)
 
 def get_user_config(user_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -241,99 +551,34 @@ def get_user_config(user_id: int) -> Optional[Dict[str, Any]]:
     返回:
     dict: 用户配置信息，包含解密后的敏感信息
     """
+    cached_config = _config_cache_get(('config', user_id))
+    if cached_config is not None:
+        return cached_config
+    
     try:
         # 连接数据库，确保读取最新数据
-        conn = sqlite3.connect(DB_PATH)
-        # 设置WAL模式并确保读取最新数据
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.execute('PRAGMA synchronous=FULL')
-        # 确保读取到最新提交的数据
-        conn.execute('BEGIN IMMEDIATE')
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
-        logger.info(f"开始获取用户配置: user_id={user_id}")
+        logger.debug("开始获取用户配置: user_id=%s", user_id)
         
         # 查找用户配置
-        cursor.execute('''
-            SELECT tushare_token, email_sender_address, email_smtp_server, 
-                   email_smtp_port, email_smtp_user, email_smtp_password_encrypted,
-                   ai_api_keys_json_encrypted, ai_configurations_json_encrypted,
-                   proxy_settings_json_encrypted, preferred_llm, updated_at
-            FROM users 
-            WHERE id = ? AND is_active = 1
-        ''', (user_id,))
+        cursor.execute(_SELECT_USER_CONFIG_SQL, (user_id,))
         
         config_row = cursor.fetchone()
         if not config_row:
             logger.warning(f"未找到用户配置: user_id={user_id}")
             return None
         
-        logger.info(f"找到用户配置: user_id={user_id}, 最后更新={config_row['updated_at']}")
-        
-        # 解密敏感信息
-        email_password = None
-        if config_row['email_smtp_password_encrypted']:
-            email_password = decrypt_string(config_row['email_smtp_password_encrypted'])
-        
-        ai_api_keys = {}
-        if config_row['ai_api_keys_json_encrypted']:
-            ai_api_keys = decrypt_json(config_row['ai_api_keys_json_encrypted']) or {}
-        
-        ai_configurations = {}
-        if config_row['ai_configurations_json_encrypted']:
-            try:
-                ai_configurations = decrypt_json(config_row['ai_configurations_json_encrypted']) or {}
-                logger.info(f"AI配置解密成功: user_id={user_id}, 提供商数量={len(ai_configurations)}")
-                
-                # 详细记录每个提供商的配置状态
-                for provider_id, provider_config in ai_configurations.items():
-                    has_api_key = bool(provider_config.get('api_key'))
-                    model = provider_config.get('model_id', 'N/A')
-                    enabled = provider_config.get('enabled', False)
-                    logger.info(f"  提供商 {provider_id}: 模型={model}, 启用={enabled}, 有密钥={has_api_key}")
-                    
-            except Exception as e:
-                logger.error(f"AI配置解密失败: user_id={user_id}, 错误={e}")
-                ai_configurations = {}
+        user_config = _row_to_user_config(config_row)
+        _config_cache_put(('config', user_id), user_config)
         
-        proxy_settings = {}
-        if config_row['proxy_settings_json_encrypted']:
-            try:
-                proxy_settings = decrypt_json(config_row['proxy_settings_json_encrypted']) or {}
-                if proxy_settings:
-                    proxy_enabled = proxy_settings.get('enabled', False)
-                    proxy_host = proxy_settings.get('host', 'N/A')
-                    logger.info(f"代理设置: user_id={user_id}, 启用={proxy_enabled}, 主机={proxy_host}")
-            except Exception as e:
-                logger.error(f"代理设置解密失败: user_id={user_id}, 错误={e}")
-                proxy_settings = {}
-        
-        # 提交事务
-        conn.commit()
-        
-        user_config = {
-            'tushare_token': config_row['tushare_token'],
-            'email_sender_address': config_row['email_sender_address'],
-            'email_smtp_server': config_row['email_smtp_server'],
-            'email_smtp_port': config_row['email_smtp_port'],
-            'email_smtp_user': config_row['email_smtp_user'],
-            'email_smtp_password': email_password,
-            'ai_api_keys': ai_api_keys,
-            'ai_configurations': ai_configurations,
-            'proxy_settings': proxy_settings,
-            'preferred_llm': config_row['preferred_llm'] or 'openai'
-        }
-        
-        logger.info(f"用户配置获取成功: user_id={user_id}")
+        logger.debug("用户配置获取成功: user_id=%s", user_id)
         return user_config
         
     except Exception as e:
         logger.error(f"获取用户配置失败: user_id={user_id}, 错误={e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_user_config_summary(user_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -345,55 +590,53 @@ def get_user_config_summary(user_id: int) -> Optional[Dict[str, Any]]:
     返回:
     dict: 用户配置摘要，只包含是否已配置的状态
     """
+    cached_summary = _config_cache_get(('summary', user_id))
+    if cached_summary is not None:
+        return cached_summary
+    
     try:
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 查找用户配置
-        cursor.execute('''
-            SELECT tushare_token, email_sender_address, email_smtp_server, 
-                   email_smtp_port, email_smtp_user, email_smtp_password_encrypted,
-                   ai_api_keys_json_encrypted, ai_configurations_json_encrypted,
-                   proxy_settings_json_encrypted, preferred_llm
-            FROM users 
-            WHERE id = ? AND is_active = 1
-        ''', (user_id,))
+        cursor.execute(_SELECT_USER_CONFIG_SUMMARY_SQL, (user_id,))
         
         config_row = cursor.fetchone()
         if not config_row:
             return None
         
-        # 检查AI API Keys
-        ai_keys_count = 0
-        ai_keys_detail = {}
-        if config_row['ai_api_keys_json_encrypted']:
-            ai_api_keys = decrypt_json(config_row['ai_api_keys_json_encrypted'])
-            if ai_api_keys:
-                ai_keys_count = len(ai_api_keys)
-                # 提供可用的LLM列表（不暴露API密钥）
-                ai_keys_detail = {key: bool(value) for key, value in ai_api_keys.items()}
+        # 优先读取非敏感的摘要字段；旧数据尚未写入摘要字段时回退到解密
+        # 检查AI API Keys（提供可用的LLM列表，不暴露API密钥）
+        if config_row['ai_keys_configured'] is not None:
+            ai_keys_detail = json.loads(config_row['ai_keys_configured'])
+        elif config_row['ai_api_keys_json_encrypted']:
+            ai_api_keys = decrypt_json(config_row['ai_api_keys_json_encrypted']) or {}
+            ai_keys_detail = {key: bool(value) for key, value in ai_api_keys.items()}
+        else:
+            ai_keys_detail = {}
         
         # 检查AI配置
-        ai_configurations_count = 0
-        ai_providers_configured = []
-        if config_row['ai_configurations_json_encrypted']:
-            ai_configurations = decrypt_json(config_row['ai_configurations_json_encrypted'])
-            if ai_configurations:
-                ai_configurations_count = len(ai_configurations)
-                ai_providers_configured = list(ai_configurations.keys())
+        if config_row['ai_providers_configured'] is not None:
+            ai_providers_configured = json.loads(config_row['ai_providers_configured'])
+        elif config_row['ai_configurations_json_encrypted']:
+            ai_providers_configured = list((decrypt_json(config_row['ai_configurations_json_encrypted']) or {}).keys())
+        else:
+            ai_providers_configured = []
         
         # 检查代理设置
-        has_proxy_config = False
-        proxy_enabled = False
-        if config_row['proxy_settings_json_encrypted']:
-            proxy_settings = decrypt_json(config_row['proxy_settings_json_encrypted'])
-            if proxy_settings:
-                has_proxy_config = bool(proxy_settings.get('host') and proxy_settings.get('port'))
-                proxy_enabled = proxy_settings.get('enabled', False)
+        if config_row['proxy_has_config'] is not None:
+            has_proxy_config = bool(config_row['proxy_has_config'])
+            proxy_enabled = bool(config_row['proxy_enabled'])
+        elif config_row['proxy_settings_json_encrypted']:
+            proxy_settings = decrypt_json(config_row['proxy_settings_json_encrypted']) or {}
+            has_proxy_config = bool(proxy_settings.get('host') and proxy_settings.get('port'))
+            proxy_enabled = bool(proxy_settings.get('enabled', False))
+        else:
+            has_proxy_config = False
+            proxy_enabled = False
         
-        return {
+        config_summary = {
             'has_tushare_token': bool(config_row['tushare_token']),
             'has_email_config': bool(config_row['email_smtp_server'] and config_row['email_smtp_user']),
             'email_sender_address': config_row['email_sender_address'],
@@ -401,21 +644,20 @@ def get_user_config_summary(user_id: int) -> Optional[Dict[str, Any]]:
             'email_smtp_port': config_row['email_smtp_port'],
             'email_smtp_user': config_row['email_smtp_user'],
             'has_email_password': bool(config_row['email_smtp_password_encrypted']),
-            'ai_keys_count': ai_keys_count,
+            'ai_keys_count': len(ai_keys_detail),
             'ai_keys_detail': ai_keys_detail,
-            'ai_configurations_count': ai_configurations_count,
+            'ai_configurations_count': len(ai_providers_configured),
             'ai_providers_configured': ai_providers_configured,
             'has_proxy_config': has_proxy_config,
             'proxy_enabled': proxy_enabled,
             'preferred_llm': config_row['preferred_llm'] or 'openai'
         }
+        _config_cache_put(('summary', user_id), config_summary)
+        return config_summary
         
     except Exception as e:
         logger.error(f"获取用户配置摘要失败: {e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool, str]:
     """
@@ -429,59 +671,40 @@ def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool,
     tuple: (成功标志, 消息)
     """
     try:
-        # 连接数据库，确保使用正确的同步模式
-        conn = sqlite3.connect(DB_PATH)
-        # 设置WAL模式以提高并发性能，但确保读写一致性
-        conn.execute('PRAGMA journal_mode=WAL')
-        conn.execute('PRAGMA synchronous=FULL')  # 确保数据完全同步到磁盘
+        # 连接数据库
+        conn = get_conn()
         cursor = conn.cursor()
         
-        # 准备更新的字段和值
-        update_fields = []
-        update_values = []
+        # 准备更新的字段和值（列名 -> 值）
+        updates = {}
         
         # 处理各个配置字段
-        if 'tushare_token' in config_data:
-            update_fields.append('tushare_token = ?')
-            update_values.append(config_data['tushare_token'])
-        
-        if 'email_sender_address' in config_data:
-            update_fields.append('email_sender_address = ?')
-            update_values.append(config_data['email_sender_address'])
-        
-        if 'email_smtp_server' in config_data:
-            update_fields.append('email_smtp_server = ?')
-            update_values.append(config_data['email_smtp_server'])
-        
-        if 'email_smtp_port' in config_data:
-            update_fields.append('email_smtp_port = ?')
-            update_values.append(config_data['email_smtp_port'])
-        
-        if 'email_smtp_user' in config_data:
-            update_fields.append('email_smtp_user = ?')
-            update_values.append(config_data['email_smtp_user'])
+        for field in ('tushare_token', 'email_sender_address', 'email_smtp_server',
+                      'email_smtp_port', 'email_smtp_user'):
+            if field in config_data:
+                updates[field] = config_data[field]
         
         # 处理加密字段
         if 'email_smtp_password' in config_data:
-            encrypted_password = encrypt_string(config_data['email_smtp_password'])
-            update_fields.append('email_smtp_password_encrypted = ?')
-            update_values.append(encrypted_password)
+            updates['email_smtp_password_encrypted'] = encrypt_string(config_data['email_smtp_password'])
         
+        # 加密字段同时写入对应的非敏感摘要字段
         if 'ai_api_keys' in config_data:
-            encrypted_keys = encrypt_json(config_data['ai_api_keys'])
-            update_fields.append('ai_api_keys_json_encrypted = ?')
-            update_values.append(encrypted_keys)
+            ai_api_keys = config_data['ai_api_keys'] or {}
+            updates['ai_api_keys_json_encrypted'] = encrypt_json(ai_api_keys)
+            updates['ai_keys_configured'] = json.dumps({key: bool(value) for key, value in ai_api_keys.items()})
         
         if 'ai_configurations' in config_data:
-            encrypted_configs = encrypt_json(config_data['ai_configurations'])
-            update_fields.append('ai_configurations_json_encrypted = ?')
-            update_values.append(encrypted_configs)
-            logger.info(f"准备更新AI配置: user_id={user_id}, 配置数量={len(config_data['ai_configurations'])}")
+            ai_configurations = config_data['ai_configurations'] or {}
+            updates['ai_configurations_json_encrypted'] = encrypt_json(ai_configurations)
+            updates['ai_providers_configured'] = json.dumps(list(ai_configurations.keys()))
+            logger.info(f"准备更新AI配置: user_id={user_id}, 配置数量={len(ai_configurations)}")
         
         if 'proxy_settings' in config_data:
-            encrypted_proxy = encrypt_json(config_data['proxy_settings'])
-            update_fields.append('proxy_settings_json_encrypted = ?')
-            update_values.append(encrypted_proxy)
+            proxy_settings = config_data['proxy_settings'] or {}
+            updates['proxy_settings_json_encrypted'] = encrypt_json(proxy_settings)
+            updates['proxy_has_config'] = int(bool(proxy_settings.get('host') and proxy_settings.get('port')))
+            updates['proxy_enabled'] = int(bool(proxy_settings.get('enabled', False)))
         
         if 'preferred_llm' in config_data:
             # 验证LLM选择是否有效
@@ -489,39 +712,27 @@ def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool,
             preferred_llm = config_data['preferred_llm'].lower() if config_data['preferred_llm'] else 'openai'
             if preferred_llm not in valid_llms:
                 preferred_llm = 'openai'
-            update_fields.append('preferred_llm = ?')
-            update_values.append(preferred_llm)
+            updates['preferred_llm'] = preferred_llm
         
-        if not update_fields:
+        if not updates:
             return False, "没有需要更新的配置"
         
-        # 添加更新时间
-        update_fields.append('updated_at = ?')
-        update_values.append(datetime.now())
-        
-        # 添加用户ID作为WHERE条件
+        # 按固定列顺序组装参数：各字段值、用户ID（WHERE条件）；更新时间由SQLite写入
+        update_values = [updates[column] for column in _CONFIG_UPDATE_COLUMNS if column in updates]
         update_values.append(user_id)
         
-        # 执行更新
-        sql = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(sql, update_values)
-        
-        # 强制提交更改并等待写入完成
-        conn.commit()
+        # 执行更新（相同字段组合复用同一条SQL文本），with 块结束时提交
+        with conn:
+            cursor.execute(_get_config_update_sql(frozenset(updates)), update_values)
+        _config_cache_invalidate(user_id)
         
         # 添加验证步骤：立即读取更新后的配置验证是否成功
         if cursor.rowcount > 0:
-            # 等待一小段时间确保数据库完全同步
-            import time
-            time.sleep(0.1)
-            
             # 验证更新是否生效
             verification_success = False
             try:
-                # 重新连接数据库进行验证
-                verify_conn = sqlite3.connect(DB_PATH)
-                verify_conn.row_factory = sqlite3.Row
-                verify_cursor = verify_conn.cursor()
+                # 读取更新后的数据进行验证
+                verify_cursor = get_conn().cursor()
                 
                 verify_cursor.execute('''
                     SELECT updated_at, ai_configurations_json_encrypted 
@@ -531,9 +742,10 @@ def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool,
                 
                 verify_row = verify_cursor.fetchone()
                 if verify_row:
-                    # 检查时间戳是否为最新
+                    # 检查时间戳是否为最新（CURRENT_TIMESTAMP 为UTC时间）
                     stored_time = datetime.fromisoformat(verify_row['updated_at'].replace('Z', ''))
-                    time_diff = abs((datetime.now() - stored_time).total_seconds())
+                    utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+                    time_diff = abs((utc_now - stored_time).total_seconds())
                     
                     if time_diff < 2:  # 2秒内的更新认为是有效的
                         verification_success = True
@@ -541,8 +753,6 @@ def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool,
                     else:
                         logger.warning(f"配置更新时间异常: user_id={user_id}, 时间差={time_diff:.2f}秒")
                 
-                verify_conn.close()
-                
             except Exception as e:
                 logger.error(f"配置更新验证失败: {e}")
             
@@ -558,9 +768,6 @@ def update_user_config(user_id: int, config_data: Dict[str, Any]) -> tuple[bool,
     except Exception as e:
         logger.error(f"用户配置更新失败: {e}")
         return False, "配置更新失败，请稍后重试"
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def change_password(user_id: int, old_password: str, new_password: str) -> tuple[bool, str]:
     """
@@ -576,12 +783,11 @@ def change_password(user_id: int, old_password: str, new_password: str) -> tuple
     """
     try:
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 获取当前密码哈希
-        cursor.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
+        cursor.execute(_SELECT_PASSWORD_HASH_SQL, (user_id,))
         user_row = cursor.fetchone()
         
         if not user_row:
@@ -594,15 +800,13 @@ def change_password(user_id: int, old_password: str, new_password: str) -> tuple
         # 生成新密码哈希
         new_password_hash = generate_password_hash(new_password)
         
-        # 更新密码
-        cursor.execute('''
-            UPDATE users 
-            SET password_hash = ?, updated_at = ? 
-            WHERE id = ?
-        ''', (new_password_hash, datetime.now(), user_id))
+        # 更新密码（with 块结束时提交）
+        with conn:
+            cursor.execute(_UPDATE_PASSWORD_SQL, (new_password_hash, user_id))
         
-        # 提交更改
-        conn.commit()
+        # 旧密码对应的登录缓存和配置缓存立即失效
+        _auth_cache_invalidate_user(user_id)
+        _config_cache_invalidate(user_id)
         
         logger.info(f"用户密码修改成功: user_id={user_id}")
         return True, "密码修改成功"
@@ -610,9 +814,6 @@ def change_password(user_id: int, old_password: str, new_password: str) -> tuple
     except Exception as e:
         logger.error(f"用户密码修改失败: {e}")
         return False, "密码修改失败，请稍后重试"
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_user_config_by_email(email: str) -> Optional[Dict[str, Any]]:
     """
@@ -626,31 +827,21 @@ def get_user_config_by_email(email: str) -> Optional[Dict[str, Any]]:
     """
     try:
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
-        # 根据邮箱查找用户ID
-        cursor.execute('''
-            SELECT id FROM users 
-            WHERE email = ? AND is_active = 1
-        ''', (email,))
+        # 根据邮箱直接查找用户配置
+        cursor.execute(_SELECT_USER_CONFIG_BY_EMAIL_SQL, (email,))
         
-        user_row = cursor.fetchone()
-        if not user_row:
+        config_row = cursor.fetchone()
+        if not config_row:
             return None
         
-        user_id = user_row['id']
-        
-        # 获取用户配置
-        return get_user_config(user_id)
+        return _row_to_user_config(config_row)
         
     except Exception as e:
         logger.error(f"根据邮箱获取用户配置失败: {e}")
         return None
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_user_config_for_editing(user_id: int) -> Optional[Dict[str, Any]]:
     """
@@ -664,19 +855,11 @@ def get_user_config_for_editing(user_id: int) -> Optional[Dict[str, Any]]:
     """
     try:
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 查找用户配置
-        cursor.execute('''
-            SELECT tushare_token, email_sender_address, email_smtp_server, 
-                   email_smtp_port, email_smtp_user, email_smtp_password_encrypted,
-                   ai_api_keys_json_encrypted, ai_configurations_json_encrypted,
-                   proxy_settings_json_encrypted, preferred_llm
-            FROM users 
-            WHERE id = ? AND is_active = 1
-        ''', (user_id,))
+        cursor.execute(_SELECT_USER_CONFIG_SQL, (user_id,))
         
         config_row = cursor.fetchone()
         if not config_row:
@@ -695,36 +878,21 @@ def get_user_config_for_editing(user_id: int) -> Optional[Dict[str, Any]]:
         if config_row['proxy_settings_json_encrypted']:
             proxy_settings = decrypt_json(config_row['proxy_settings_json_encrypted']) or {}
         
-        # 处理敏感信息的显示
-        def mask_sensitive_value(value):
-            """对敏感信息进行掩码处理"""
-            if not value:
-                return ''
-            if len(value) <= 8:
-                return '*' * len(value)
-            return value[:4] + '*' * (len(value) - 8) + value[-4:]
-        
-        # 处理AI配置中的API密钥
-        masked_ai_configurations = {}
-        for provider_id, config in ai_configurations.items():
-            masked_config = config.copy()
-            if 'api_key' in masked_config and masked_config['api_key']:
-                masked_config['api_key'] = mask_sensitive_value(masked_config['api_key'])
-            masked_ai_configurations[provider_id] = masked_config
-        
-        # 处理代理设置中的密码
-        masked_proxy_settings = proxy_settings.copy()
-        if 'password' in masked_proxy_settings and masked_proxy_settings['password']:
-            masked_proxy_settings['password'] = mask_sensitive_value(masked_proxy_settings['password'])
+        # 处理AI配置中的API密钥和代理设置中的密码
+        masked_ai_configurations = {
+            provider_id: _mask_field(config, 'api_key')
+            for provider_id, config in ai_configurations.items()
+        }
+        masked_proxy_settings = _mask_field(proxy_settings, 'password')
         
         return {
-            'tushare_token': mask_sensitive_value(config_row['tushare_token']) if config_row['tushare_token'] else '',
+            'tushare_token': _mask_sensitive_value(config_row['tushare_token']) if config_row['tushare_token'] else '',
             'email_sender_address': config_row['email_sender_address'] or '',
             'email_smtp_server': config_row['email_smtp_server'] or '',
             'email_smtp_port': config_row['email_smtp_port'] or 587,
             'email_smtp_user': config_row['email_smtp_user'] or '',
             'has_email_password': bool(config_row['email_smtp_password_encrypted']),
-            'ai_api_keys': {k: mask_sensitive_value(v) for k, v in ai_api_keys.items() if v},
+            'ai_api_keys': {k: _mask_sensitive_value(v) for k, v in ai_api_keys.items() if v},
             'ai_configurations': masked_ai_configurations,
             'proxy_settings': masked_proxy_settings,
             'preferred_llm': config_row['preferred_llm'] or 'openai'
@@ -732,7 +900,4 @@ def get_user_config_for_editing(user_id: int) -> Optional[Dict[str, Any]]:
         
     except Exception as e:
         logger.error(f"获取用户编辑配置失败: {e}")
-        return None
-    finally:
-        if 'conn' in locals():
-            conn.close() 
\ No newline at end of file
+        return None
\ No newline at end of file
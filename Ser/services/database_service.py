@@ -1,104 +1,235 @@
-import sqlite3
-import os
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 import json
+from collections import namedtuple
+from .db_pool import get_conn
 
 # 配置日志
 logger = logging.getLogger('database_service')
 
-# 数据库文件路径
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'stock_monitor.db')
+# 表结构只需在进程内初始化一次（应用启动时调用 init_database）
+_INIT_DONE = False
+_INIT_LOCK = threading.Lock()
+
+# 告警日志查询的过滤条件，按位对应 user_email、stock_code、start_date、end_date
+_ALERT_LOG_FILTER_CLAUSES = (
+    ' AND user_email = ?',
+    ' AND stock_code = ?',
+    ' AND alert_timestamp >= ?',
+    ' AND alert_timestamp <= ?',
+)
+
+_INSERT_ALERT_LOG_SQL = '''
+    INSERT INTO alert_logs 
+    (stock_code, stock_name, alert_timestamp, triggered_price, threshold_price, 
+     direction, ai_analysis, user_email)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 告警日志查询返回的字段（查询结果直接映射为命名元组，避免逐行按列名构建字典）
+AlertLog = namedtuple('AlertLog', [
+    'id', 'user_id', 'stock_code', 'stock_name', 'alert_timestamp',
+    'triggered_price', 'threshold_price', 'direction', 'ai_analysis',
+    'user_email', 'created_at', 'updated_at'
+])
+
+_ALERT_LOGS_SELECT_SQL = f'''
+    SELECT {', '.join(AlertLog._fields)}
+    FROM alert_logs
+'''
+
+_ALERT_LOGS_PAGE_SELECT_SQL = f'''
+    SELECT {', '.join(AlertLog._fields)}, COUNT(*) OVER() AS total_count
+    FROM alert_logs
+'''
+
+_ALERT_LOGS_ORDER_SQL = ' ORDER BY alert_timestamp DESC LIMIT ? OFFSET ?'
+
+_ALERT_LOGS_COUNT_SQL = 'SELECT COUNT(*) FROM alert_logs'
+
+# 按过滤条件位图缓存的SQL文本（最多16种组合），相同文本可命中SQLite的语句缓存
+_ALERT_LOGS_SQL_CACHE: Dict[int, str] = {}
+_ALERT_LOGS_COUNT_SQL_CACHE: Dict[int, str] = {}
+_ALERT_LOGS_PAGE_SQL_CACHE: Dict[int, str] = {}
+
+def _alert_log_filters(
+    user_email: Optional[str],
+    stock_code: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> Tuple[int, list]:
+    """
+    计算告警日志过滤条件的位图和对应参数
+    
+    返回:
+    tuple: (位图, 参数列表)
+    """
+    mask = 0
+    params = []
+    for bit, value in enumerate((user_email, stock_code, start_date, end_date)):
+        if value:
+            mask |= 1 << bit
+            params.append(value)
+    return mask, params
+
+def _alert_log_where(mask: int) -> str:
+    """根据过滤条件位图生成WHERE子句"""
+    return ' WHERE 1=1' + ''.join(
+        clause for bit, clause in enumerate(_ALERT_LOG_FILTER_CLAUSES) if mask & (1 << bit)
+    )
 
 def init_database():
     """
     初始化数据库，创建必要的表
     """
-    try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        
-        # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # 创建用户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                tushare_token TEXT,
-                email_sender_address TEXT,
-                email_smtp_server TEXT,
-                email_smtp_port INTEGER DEFAULT 587,
-                email_smtp_user TEXT,
-                email_smtp_password_encrypted TEXT,
-                ai_api_keys_json_encrypted TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 创建告警日志表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alert_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                stock_code TEXT NOT NULL,
-                stock_name TEXT NOT NULL,
-                alert_timestamp DATETIME NOT NULL,
-                triggered_price REAL NOT NULL,
-                threshold_price REAL NOT NULL,
-                direction TEXT NOT NULL CHECK (direction IN ('UP', 'DOWN')),
-                ai_analysis TEXT,
-                user_email TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    global _INIT_DONE
+    if _INIT_DONE:
+        return
+    
+    with _INIT_LOCK:
+        if _INIT_DONE:
+            return
+        
+        try:
+            # 连接数据库
+            conn = get_conn()
+            cursor = conn.cursor()
+            
+            # 建表与索引在同一个事务中完成，with 块结束时提交
+            with conn:
+                # 创建用户表
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        email TEXT UNIQUE NOT NULL,
+                        password_hash TEXT NOT NULL,
+                        tushare_token TEXT,
+                        email_sender_address TEXT,
+                        email_smtp_server TEXT,
+                        email_smtp_port INTEGER DEFAULT 587,
+                        email_smtp_user TEXT,
+                        email_smtp_password_encrypted TEXT,
+                        ai_api_keys_json_encrypted TEXT,
+                        is_active BOOLEAN DEFAULT 1,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # 创建告警日志表
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS alert_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT,
+                        stock_code TEXT NOT NULL,
+                        stock_name TEXT NOT NULL,
+                        alert_timestamp DATETIME NOT NULL,
+                        triggered_price REAL NOT NULL,
+                        threshold_price REAL NOT NULL,
+                        direction TEXT NOT NULL CHECK (direction IN ('UP', 'DOWN')),
+                        ai_analysis TEXT,
+                        user_email TEXT,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # 创建用户表索引
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_username 
+                    ON users(username)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_users_email 
+                    ON users(email)
+                ''')
+                
+                # 创建告警日志表索引以提高查询性能
+                # 按用户/股票过滤并按时间倒序分页是主要查询模式，复合索引可同时满足过滤和排序
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_alert_logs_user_ts 
+                    ON alert_logs(user_email, alert_timestamp DESC)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_alert_logs_stock_ts 
+                    ON alert_logs(stock_code, alert_timestamp DESC)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_alert_logs_timestamp 
+                    ON alert_logs(alert_timestamp)
+                ''')
+                
+                # 单列索引已被复合索引的前缀覆盖，删除以减少写入开销
+                cursor.execute('DROP INDEX IF EXISTS idx_alert_logs_stock_code')
+                cursor.execute('DROP INDEX IF EXISTS idx_alert_logs_user_email')
+            
+            logger.info("数据库初始化成功")
+            
+            _INIT_DONE = True
+            
+        except Exception as e:
+            logger.error(f"数据库初始化失败: {e}")
+            raise
+
+def _parse_iso(value: str) -> datetime:
+    """
+    解析ISO格式时间字符串
+    
+    系统内常见的 "YYYY-MM-DD HH:MM:SS"/"YYYY-MM-DDTHH:MM:SS"（可带 Z 后缀）直接按位置切片解析，
+    其他格式回退到 datetime.fromisoformat
+    """
+    length = len(value)
+    if (
+        (length == 19 or (length == 20 and value[19] == 'Z'))
+        and value[4] == value[7] == '-' and value[10] in 'T ' and value[13] == value[16] == ':'
+    ):
+        try:
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                tzinfo=timezone.utc if length == 20 else None
             )
-        ''')
-        
-        # 创建用户表索引
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_users_username 
-            ON users(username)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_users_email 
-            ON users(email)
-        ''')
-        
-        # 创建告警日志表索引以提高查询性能
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_alert_logs_stock_code 
-            ON alert_logs(stock_code)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_alert_logs_timestamp 
-            ON alert_logs(alert_timestamp)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_alert_logs_user_email 
-            ON alert_logs(user_email)
-        ''')
-        
-        # 提交更改
-        conn.commit()
-        
-        logger.info("数据库初始化成功")
-        
-    except Exception as e:
-        logger.error(f"数据库初始化失败: {e}")
-        raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        except ValueError:
+            pass
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+def _alert_log_row(alert_data: Dict) -> tuple:
+    """
+    将告警数据转换为 _INSERT_ALERT_LOG_SQL 的参数元组
+    
+    参数:
+    alert_data (dict): 告警数据，字段说明见 save_alert_log
+    
+    返回:
+    tuple: 插入参数
+    """
+    # 处理时间戳
+    if 'alert_timestamp' in alert_data:
+        if isinstance(alert_data['alert_timestamp'], str):
+            alert_timestamp = _parse_iso(alert_data['alert_timestamp'])
+        else:
+            alert_timestamp = alert_data['alert_timestamp']
+    else:
+        alert_timestamp = datetime.now()
+    
+    return (
+        alert_data['stock_code'],
+        alert_data['stock_name'],
+        alert_timestamp,
+        float(alert_data['triggered_price']),
+        float(alert_data.get('threshold_price', alert_data.get('threshold', 0))),
+        alert_data['direction'],
+        alert_data.get('ai_analysis', ''),
+        alert_data.get('user_email', '')
+    )
 
 def save_alert_log(alert_data: Dict) -> int:
     """
@@ -119,56 +250,150 @@ def save_alert_log(alert_data: Dict) -> int:
     int: 插入记录的ID
     """
     try:
-        # 确保数据库已初始化
-        init_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 准备数据
-        stock_code = alert_data['stock_code']
-        stock_name = alert_data['stock_name']
-        triggered_price = float(alert_data['triggered_price'])
-        threshold_price = float(alert_data.get('threshold_price', alert_data.get('threshold', 0)))
-        direction = alert_data['direction']
-        ai_analysis = alert_data.get('ai_analysis', '')
-        user_email = alert_data.get('user_email', '')
-        
-        # 处理时间戳
-        if 'alert_timestamp' in alert_data:
-            if isinstance(alert_data['alert_timestamp'], str):
-                alert_timestamp = datetime.fromisoformat(alert_data['alert_timestamp'].replace('Z', '+00:00'))
-            else:
-                alert_timestamp = alert_data['alert_timestamp']
-        else:
-            alert_timestamp = datetime.now()
+        row = _alert_log_row(alert_data)
         
-        # 插入数据
-        cursor.execute('''
-            INSERT INTO alert_logs 
-            (stock_code, stock_name, alert_timestamp, triggered_price, threshold_price, 
-             direction, ai_analysis, user_email)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (stock_code, stock_name, alert_timestamp, triggered_price, threshold_price,
-              direction, ai_analysis, user_email))
+        # 插入数据（with 块结束时提交）
+        with conn:
+            cursor.execute(_INSERT_ALERT_LOG_SQL, row)
         
         # 获取插入记录的ID
         alert_id = cursor.lastrowid
         
-        # 提交更改
-        conn.commit()
-        
-        logger.info(f"告警日志保存成功: ID={alert_id}, {stock_code} {direction} {triggered_price}")
+        logger.info(f"告警日志保存成功: ID={alert_id}, {row[0]} {row[5]} {row[3]}")
         
         return alert_id
         
     except Exception as e:
         logger.error(f"保存告警日志失败: {e}")
         raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def save_alert_logs_bulk(alert_data_list: List[Dict]) -> int:
+    """
+    批量保存告警日志（单个事务、一次提交）
+    
+    参数:
+    alert_data_list (list): 告警数据列表，每项字段同 save_alert_log
+    
+    返回:
+    int: 插入的记录数
+    """
+    if not alert_data_list:
+        return 0
+    
+    try:
+        # 连接数据库
+        conn = get_conn()
+        
+        # 准备数据
+        rows = [_alert_log_row(alert_data) for alert_data in alert_data_list]
+        
+        # 批量插入（with 块结束时统一提交）
+        with conn:
+            conn.executemany(_INSERT_ALERT_LOG_SQL, rows)
+        
+        logger.info(f"批量保存告警日志成功: {len(rows)} 条")
+        
+        return len(rows)
+        
+    except Exception as e:
+        logger.error(f"批量保存告警日志失败: {e}")
+        raise
+
+def replay_alerts_from_file(path: str) -> int:
+    """
+    从历史数据文件批量导入告警日志（用于回放/测试）
+    
+    支持 .parquet（需安装 pyarrow）与 .csv 文件，列名同 save_alert_log 的字段。
+    价格与方向的校验在整列上向量化完成，只有通过校验的行才写入数据库。
+    
+    参数:
+    path (str): 数据文件路径
+    
+    返回:
+    int: 导入的记录数
+    """
+    import numpy as np
+    import pandas as pd
+    
+    try:
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        else:
+            # 股票代码按字符串读取，保留前导零（如 000001）
+            df = pd.read_csv(path, dtype={'stock_code': str})
+        
+        # 必填字段为空的行跳过（时间戳列不存在时使用导入时间，见 _alert_log_row）
+        required_columns = ['stock_code', 'stock_name', 'direction']
+        if 'alert_timestamp' in df.columns:
+            required_columns.append('alert_timestamp')
+        present = df[required_columns].apply(
+            lambda column: column.notna() & column.astype(str).str.strip().ne('')
+        ).all(axis=1).to_numpy()
+        
+        missing = int((~present).sum())
+        if missing:
+            logger.warning(f"回放数据中有 {missing} 条记录缺少 {', '.join(required_columns)} 中的字段，已跳过")
+        
+        triggered = pd.to_numeric(df['triggered_price'], errors='coerce').to_numpy(dtype=float)
+        threshold = pd.to_numeric(df['threshold_price'], errors='coerce').to_numpy(dtype=float)
+        direction = df['direction'].astype(str).str.upper().to_numpy()
+        
+        # 价格必须有效，且触发价格与方向一致（UP 不低于阈值，DOWN 不高于阈值）
+        is_up = direction == 'UP'
+        is_down = direction == 'DOWN'
+        prices_valid = (
+            np.isfinite(triggered) & np.isfinite(threshold)
+            & ((is_up & (triggered >= threshold)) | (is_down & (triggered <= threshold)))
+        )
+        valid = present & prices_valid
+        
+        skipped = int((present & ~prices_valid).sum())
+        if skipped:
+            logger.warning(f"回放数据中有 {skipped} 条记录未通过校验，已跳过")
+        
+        df = df[valid].assign(
+            triggered_price=triggered[valid],
+            threshold_price=threshold[valid],
+            direction=direction[valid]
+        )
+        df = df.astype(object).where(df.notna(), None)
+        if 'alert_timestamp' in df.columns:
+            df['alert_timestamp'] = df['alert_timestamp'].astype(str)
+        
+        return save_alert_logs_bulk(df.to_dict('records'))
+        
+    except Exception as e:
+        logger.error(f"回放告警日志失败: {e}")
+        raise
+
+def _alert_log_factory(cursor, row: tuple) -> AlertLog:
+    """游标行工厂：将查询行映射为 AlertLog"""
+    return AlertLog._make(row)
+
+def _alert_log_page_factory(cursor, row: tuple) -> Tuple[AlertLog, int]:
+    """分页查询的游标行工厂：返回 (AlertLog, 总数)"""
+    return AlertLog._make(row[:-1]), row[-1]
+
+def _alert_log_to_dict(alert_log: AlertLog) -> Dict:
+    """
+    将 AlertLog 转换为字典（供接口返回JSON）
+    
+    ai_analysis 只有以 { 或 [ 开头时才尝试按JSON解析，纯文本直接保留，避免抛异常
+    """
+    result = alert_log._asdict()
+    ai_analysis = alert_log.ai_analysis
+    if ai_analysis and ai_analysis.lstrip()[:1] in ('{', '['):
+        try:
+            result['ai_analysis'] = json.loads(ai_analysis)
+        except ValueError:
+            # 如果不是合法JSON，保持原文本
+            pass
+    return result
 
 def get_alert_logs(
     user_email: Optional[str] = None,
@@ -193,43 +418,16 @@ def get_alert_logs(
     List[Dict]: 告警日志列表
     """
     try:
-        # 确保数据库已初始化
-        init_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # 使查询结果可以像字典一样访问
+        conn = get_conn()
         cursor = conn.cursor()
+        cursor.row_factory = _alert_log_factory
         
-        # 构建查询语句
-        query = '''
-            SELECT id, user_id, stock_code, stock_name, alert_timestamp, 
-                   triggered_price, threshold_price, direction, ai_analysis, 
-                   user_email, created_at, updated_at
-            FROM alert_logs
-            WHERE 1=1
-        '''
-        params = []
-        
-        # 添加过滤条件
-        if user_email:
-            query += ' AND user_email = ?'
-            params.append(user_email)
-        
-        if stock_code:
-            query += ' AND stock_code = ?'
-            params.append(stock_code)
-        
-        if start_date:
-            query += ' AND alert_timestamp >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND alert_timestamp <= ?'
-            params.append(end_date)
-        
-        # 排序和分页
-        query += ' ORDER BY alert_timestamp DESC LIMIT ? OFFSET ?'
+        # 按过滤条件组合取用固定的SQL文本，参数按规范顺序排列
+        mask, params = _alert_log_filters(user_email, stock_code, start_date, end_date)
+        query = _ALERT_LOGS_SQL_CACHE.get(mask)
+        if query is None:
+            query = _ALERT_LOGS_SQL_CACHE[mask] = _ALERT_LOGS_SELECT_SQL + _alert_log_where(mask) + _ALERT_LOGS_ORDER_SQL
         params.extend([limit, offset])
         
         # 执行查询
@@ -237,32 +435,7 @@ def get_alert_logs(
         rows = cursor.fetchall()
         
         # 转换为字典列表
-        results = []
-        for row in rows:
-            # 处理AI分析数据，尝试解析JSON格式
-            ai_analysis = row['ai_analysis']
-            if ai_analysis:
-                try:
-                    # 尝试解析JSON格式的AI分析
-                    ai_analysis = json.loads(ai_analysis)
-                except (json.JSONDecodeError, TypeError):
-                    # 如果不是JSON格式，保持原文本
-                    pass
-            
-            results.append({
-                'id': row['id'],
-                'user_id': row['user_id'],
-                'stock_code': row['stock_code'],
-                'stock_name': row['stock_name'],
-                'alert_timestamp': row['alert_timestamp'],
-                'triggered_price': row['triggered_price'],
-                'threshold_price': row['threshold_price'],
-                'direction': row['direction'],
-                'ai_analysis': ai_analysis,
-                'user_email': row['user_email'],
-                'created_at': row['created_at'],
-                'updated_at': row['updated_at']
-            })
+        results = [_alert_log_to_dict(row) for row in rows]
         
         logger.info(f"查询到 {len(results)} 条告警日志")
         
@@ -271,9 +444,6 @@ def get_alert_logs(
     except Exception as e:
         logger.error(f"查询告警日志失败: {e}")
         raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_alert_logs_count(
     user_email: Optional[str] = None,
@@ -290,33 +460,15 @@ def get_alert_logs_count(
     int: 告警日志总数
     """
     try:
-        # 确保数据库已初始化
-        init_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
         
-        # 构建查询语句
-        query = 'SELECT COUNT(*) FROM alert_logs WHERE 1=1'
-        params = []
-        
-        # 添加过滤条件
-        if user_email:
-            query += ' AND user_email = ?'
-            params.append(user_email)
-        
-        if stock_code:
-            query += ' AND stock_code = ?'
-            params.append(stock_code)
-        
-        if start_date:
-            query += ' AND alert_timestamp >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND alert_timestamp <= ?'
-            params.append(end_date)
+        # 按过滤条件组合取用固定的SQL文本
+        mask, params = _alert_log_filters(user_email, stock_code, start_date, end_date)
+        query = _ALERT_LOGS_COUNT_SQL_CACHE.get(mask)
+        if query is None:
+            query = _ALERT_LOGS_COUNT_SQL_CACHE[mask] = _ALERT_LOGS_COUNT_SQL + _alert_log_where(mask)
         
         # 执行查询
         cursor.execute(query, params)
@@ -327,9 +479,55 @@ def get_alert_logs_count(
     except Exception as e:
         logger.error(f"查询告警日志总数失败: {e}")
         raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def get_alert_logs_page(
+    user_email: Optional[str] = None,
+    stock_code: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> Tuple[List[Dict], int]:
+    """
+    分页查询告警日志，并在同一条语句中通过 COUNT(*) OVER() 得到总数
+    
+    参数: 同 get_alert_logs
+    
+    返回:
+    tuple: (告警日志列表, 符合条件的总数)
+    """
+    try:
+        # 连接数据库
+        conn = get_conn()
+        cursor = conn.cursor()
+        cursor.row_factory = _alert_log_page_factory
+        
+        # 按过滤条件组合取用固定的SQL文本
+        mask, params = _alert_log_filters(user_email, stock_code, start_date, end_date)
+        query = _ALERT_LOGS_PAGE_SQL_CACHE.get(mask)
+        if query is None:
+            query = _ALERT_LOGS_PAGE_SQL_CACHE[mask] = _ALERT_LOGS_PAGE_SELECT_SQL + _alert_log_where(mask) + _ALERT_LOGS_ORDER_SQL
+        
+        cursor.execute(query, params + [limit, offset])
+        rows = cursor.fetchall()
+        
+        if rows:
+            total_count = rows[0][1]
+        elif offset > 0:
+            # 页码超出范围时窗口函数没有返回行，单独查询总数
+            total_count = get_alert_logs_count(user_email, stock_code, start_date, end_date)
+        else:
+            total_count = 0
+        
+        results = [_alert_log_to_dict(alert_log) for alert_log, _ in rows]
+        
+        logger.info(f"查询到 {len(results)} 条告警日志，共 {total_count} 条")
+        
+        return results, total_count
+        
+    except Exception as e:
+        logger.error(f"分页查询告警日志失败: {e}")
+        raise
 
 def cleanup_old_alerts(days: int = 30) -> int:
     """
@@ -342,34 +540,38 @@ def cleanup_old_alerts(days: int = 30) -> int:
     int: 删除的记录数
     """
     try:
-        # 确保数据库已初始化
-        init_database()
-        
         # 连接数据库
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_conn()
         cursor = conn.cursor()
         
         # 计算删除时间点
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        # 删除旧记录
-        cursor.execute('''
-            DELETE FROM alert_logs 
-            WHERE alert_timestamp < ?
-        ''', (cutoff_date,))
+        # 删除旧记录（with 块结束时提交）
+        with conn:
+            cursor.execute('''
+                DELETE FROM alert_logs 
+                WHERE alert_timestamp < ?
+            ''', (cutoff_date,))
         
         deleted_count = cursor.rowcount
         
-        # 提交更改
-        conn.commit()
-        
         logger.info(f"清理了 {deleted_count} 条超过 {days} 天的告警日志")
         
         return deleted_count
         
     except Exception as e:
         logger.error(f"清理告警日志失败: {e}")
-        raise
-    finally:
-        if 'conn' in locals():
-            conn.close() 
\ No newline at end of file
+        raise 
+
+def optimize_database() -> None:
+    """
+    执行 PRAGMA optimize，让 SQLite 按需刷新统计信息（sqlite_stat1），
+    保持查询计划随数据量增长仍然有效。适合由定时任务周期性调用。
+    """
+    try:
+        conn = get_conn()
+        conn.execute('PRAGMA optimize')
+        logger.debug("数据库 PRAGMA optimize 执行完成")
+    except Exception as e:
+        logger.error(f"数据库优化失败: {e}")
@@ -0,0 +1,47 @@
+"""
+SQLite连接池模块
+每个工作线程持有一个长期复用的数据库连接，避免每次查询都重新打开数据库文件
+"""
+
+import sqlite3
+import os
+import threading
+
+# 数据库文件路径
+DB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+DB_PATH = os.path.join(DB_DIR, 'stock_monitor.db')
+
+# 确保数据目录存在（导入时执行一次）
+os.makedirs(DB_DIR, exist_ok=True)
+
+# 连接级PRAGMA：WAL下读写互不阻塞；NORMAL在WAL模式下只在检查点时fsync，
+# 提交只追加WAL文件；64MB页缓存与256MB内存映射减少读盘；busy_timeout避免写锁竞争时立即报错
+_CONNECTION_PRAGMAS_SQL = '''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=30000;
+'''
+
+# 线程本地存储，每个线程一个连接
+_local = threading.local()
+
+def get_conn() -> sqlite3.Connection:
+    """
+    获取当前线程的数据库连接（首次调用时创建）
+
+    连接在线程生命周期内复用，不要关闭；写操作请使用 `with conn:` 包裹，
+    成功时自动提交，异常时自动回滚，保证连接不会残留未结束的事务
+
+    返回:
+    sqlite3.Connection: 当前线程的数据库连接，查询结果为 sqlite3.Row
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_CONNECTION_PRAGMAS_SQL)
+        _local.conn = conn
+    return conn
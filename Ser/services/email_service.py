@@ -1,10 +1,11 @@
 import smtplib
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from email.utils import formataddr
 from typing import Optional, Dict, Any
-from .ai_analysis_service import get_basic_ai_analysis
 
 # 默认邮件配置（作为后备配置）
 DEFAULT_SMTP_SERVER = 'smtp.163.com'
@@ -14,12 +15,187 @@ DEFAULT_SMTP_USE_SSL = False
 # 日志配置
 logger = logging.getLogger('email_service')
 
+# SMTP账号设置（不可变、可哈希，直接作为连接池的键）
+SmtpSettings = namedtuple('SmtpSettings', ['server', 'port', 'user', 'password'])
+
+# 发件人显示名称（由 formataddr 进行RFC 2047编码）
+_SENDER_DISPLAY_NAME = '股票价格提醒'
+
+@lru_cache(maxsize=64)
+def _format_sender(email_sender: str) -> str:
+    """生成From头（显示名称固定，按发件地址缓存编码结果）"""
+    return formataddr((_SENDER_DISPLAY_NAME, email_sender))
+
+# 提醒邮件模板（模块加载时定义一次，格式化时一次 format_map 生成）
+_DIRECTION_LABELS = {'UP': ('上涨', '[UP]'), 'DOWN': ('下跌', '[DOWN]')}
+
+_ALERT_SUBJECT_TMPL = "{direction_symbol} 股票价格提醒: {stock_name}已{direction}至阈值价格"
+
+_ALERT_BODY_TMPL = """尊敬的用户：
+
+您关注的股票 {stock_name}({stock_code}) 价格已发生重要变动。
+
+当前价格: {current_price} 
+阈值价格: {threshold}
+变动方向: {direction} {direction_symbol}
+提醒时间: {timestamp}
+"""
+
+_ALERT_AI_TMPL = """
+---------- AI分析 ----------
+{ai_analysis}
+----------------------------
+"""
+
+# 汇总提醒邮件模板（同一收件人同时触发多只股票时合并为一封）
+_DIGEST_SUBJECT_TMPL = "股票价格提醒: {count}只股票突破阈值"
+
+_DIGEST_HEADER_TMPL = """尊敬的用户：
+
+您关注的 {count} 只股票价格已发生重要变动。
+"""
+
+_DIGEST_SECTION_TMPL = """
+==================== {index} ====================
+股票: {stock_name}({stock_code})
+当前价格: {current_price} 
+阈值价格: {threshold}
+变动方向: {direction} {direction_symbol}
+提醒时间: {timestamp}
+"""
+
+_ALERT_FOOTER = """
+请及时查看您的股票交易账户，并根据市场情况做出相应决策。
+
+--------------------------------
+此邮件由股票盯盘系统自动发送，请勿回复。
+"""
+
+# SMTP连接池：SmtpSettings -> {'smtp', 'opened_at', 'sent'}，
+# 同一账号的连续邮件复用已登录的连接，跳过重复的TCP/TLS握手和登录
+_smtp_pool: Dict[SmtpSettings, Dict[str, Any]] = {}
+# 每个账号一把锁：同一连接上的发送串行进行，不同账号的发送可以并发
+_smtp_key_locks: Dict[SmtpSettings, threading.Lock] = {}
+_smtp_lock = threading.Lock()  # 保护 _smtp_key_locks
+SMTP_MAX_CONNECTION_AGE = 100  # 秒，超过后重新建立连接（服务器通常会断开长时间的连接）
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100  # 单个连接最多发送的邮件数
+
+def _get_smtp_key_lock(key: SmtpSettings) -> threading.Lock:
+    """
+    获取账号对应的连接锁（首次使用时创建）
+    
+    同一服务器和用户名出现新的设置（修改了密码、端口等）时，旧设置对应的锁和连接随之移除
+    """
+    with _smtp_lock:
+        lock = _smtp_key_locks.get(key)
+        if lock is not None:
+            return lock
+        lock = _smtp_key_locks[key] = threading.Lock()
+        stale_locks = {
+            stale_key: _smtp_key_locks.pop(stale_key)
+            for stale_key in [
+                other for other in _smtp_key_locks
+                if other != key and other.server == key.server and other.user == key.user
+            ]
+        }
+    
+    # 在旧设置的锁内关闭其连接，等待正在进行的发送完成
+    for stale_key, stale_lock in stale_locks.items():
+        with stale_lock:
+            _discard_smtp(stale_key)
+    return lock
+
+def _smtp_noop_ok(smtp: smtplib.SMTP) -> bool:
+    """通过NOOP探测连接是否仍然可用"""
+    try:
+        code, _ = smtp.noop()
+        return code == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+def _open_smtp(settings: SmtpSettings) -> smtplib.SMTP:
+    """建立SMTP连接并登录"""
+    # 判断是否使用SSL（基于端口号自动判断或者用户配置）
+    use_ssl = settings.port == 465 or DEFAULT_SMTP_USE_SSL
+    
+    if use_ssl:
+        smtp = smtplib.SMTP_SSL(settings.server, settings.port)
+    else:
+        smtp = smtplib.SMTP(settings.server, settings.port)
+        smtp.ehlo()
+        # 部分服务器需要启用STARTTLS
+        if smtp.has_extn('STARTTLS'):
+            smtp.starttls()
+            smtp.ehlo()
+    
+    # 登录
+    smtp.login(settings.user, settings.password)
+    return smtp
+
+def _close_smtp(smtp: smtplib.SMTP) -> None:
+    """关闭SMTP连接，忽略已断开连接的错误"""
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+
+def _get_or_open_smtp(key: SmtpSettings) -> smtplib.SMTP:
+    """
+    从连接池获取可用的SMTP连接（调用方需持有该账号的连接锁）
+    
+    连接未超龄、未达到发送上限且NOOP探测正常时直接复用，否则关闭后重新登录
+    """
+    entry = _smtp_pool.get(key)
+    if entry is not None:
+        if (time.monotonic() - entry['opened_at'] < SMTP_MAX_CONNECTION_AGE
+                and entry['sent'] < SMTP_MAX_MESSAGES_PER_CONNECTION
+                and _smtp_noop_ok(entry['smtp'])):
+            return entry['smtp']
+        _discard_smtp(key)
+    
+    smtp = _open_smtp(key)
+    _smtp_pool[key] = {'smtp': smtp, 'opened_at': time.monotonic(), 'sent': 0}
+    return smtp
+
+def _release_smtp(key: SmtpSettings) -> None:
+    """发送成功后归还连接，累计发送数（调用方需持有该账号的连接锁）"""
+    entry = _smtp_pool.get(key)
+    if entry is not None:
+        entry['sent'] += 1
+
+def _discard_smtp(key: SmtpSettings) -> None:
+    """关闭并移除连接池中的连接，下次发送时重新连接（调用方需持有该账号的连接锁）"""
+    entry = _smtp_pool.pop(key, None)
+    if entry is not None:
+        _close_smtp(entry['smtp'])
+
+def _smtp_settings(user_config: Optional[Dict[str, Any]]):
+    """
+    从用户配置解析SMTP设置
+    
+    参数:
+    user_config (dict, optional): 用户配置，包含邮件设置
+    
+    返回:
+    tuple: (SmtpSettings, 发件人地址)
+    """
+    # 优先使用用户配置，否则使用全局配置
+    if user_config:
+        settings = SmtpSettings(
+            user_config.get('email_smtp_server', DEFAULT_SMTP_SERVER),
+            user_config.get('email_smtp_port', DEFAULT_SMTP_PORT),
+            user_config.get('email_smtp_user', ''),
+            user_config.get('email_smtp_password', '')
+        )
+        return settings, user_config.get('email_sender_address') or settings.user
+    return SmtpSettings(DEFAULT_SMTP_SERVER, DEFAULT_SMTP_PORT, '', ''), ''
+
 def send_email_alert(recipient_email, subject, body, user_config: Optional[Dict[str, Any]] = None):
     """
     发送邮件提醒
     
     参数:
-    recipient_email (str): 收件人邮箱
+    recipient_email (str|list): 收件人邮箱，传入列表时一封邮件发送给多个收件人
     subject (str): 邮件主题
     body (str): 邮件内容
     user_config (dict, optional): 用户配置，包含邮件设置
@@ -27,118 +203,89 @@ def send_email_alert(recipient_email, subject, body, user_config: Optional[Dict[
     返回:
     bool: 发送是否成功
     """
-    # 优先使用用户配置，否则使用全局配置
-    if user_config:
-        smtp_server = user_config.get('email_smtp_server', DEFAULT_SMTP_SERVER)
-        smtp_port = user_config.get('email_smtp_port', DEFAULT_SMTP_PORT)
-        smtp_user = user_config.get('email_smtp_user', '')
-        smtp_password = user_config.get('email_smtp_password', '')
-        email_sender = user_config.get('email_sender_address', smtp_user)
-    else:
-        smtp_server = DEFAULT_SMTP_SERVER
-        smtp_port = DEFAULT_SMTP_PORT
-        smtp_user = ''
-        smtp_password = ''
-        email_sender = smtp_user
+    settings, email_sender = _smtp_settings(user_config)
+    recipients = [recipient_email] if isinstance(recipient_email, str) else list(recipient_email)
     
-    if not smtp_user or not smtp_password:
+    if not settings.user or not settings.password:
         logger.error("未配置邮箱账号密码，无法发送邮件。请配置邮件设置")
         return False
         
     try:
-        # 创建邮件对象
-        msg = MIMEMultipart()
-        msg['From'] = f"{Header('股票价格提醒', 'utf-8').encode()} <{email_sender}>"
-        msg['To'] = recipient_email
-        msg['Subject'] = Header(subject, 'utf-8').encode()
-        
-        # 添加邮件内容
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-        
-        # 连接SMTP服务器
-        # 判断是否使用SSL（基于端口号自动判断或者用户配置）
-        use_ssl = smtp_port == 465 or DEFAULT_SMTP_USE_SSL
-        
-        if use_ssl:
-            smtp = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        else:
-            smtp = smtplib.SMTP(smtp_server, smtp_port)
-            smtp.ehlo()
-            # 部分服务器需要启用STARTTLS
-            if smtp.has_extn('STARTTLS'):
-                smtp.starttls()
-                smtp.ehlo()
-        
-        # 登录
-        smtp.login(smtp_user, smtp_password)
-        
-        # 发送邮件
-        smtp.sendmail(email_sender, recipient_email, msg.as_string())
+        # 创建邮件对象（email.message 仅在实际发送时导入）
+        from email.message import EmailMessage
+        msg = EmailMessage()
+        msg['From'] = _format_sender(email_sender)
+        msg['To'] = ', '.join(recipients)
+        msg['Subject'] = subject
+        msg.set_content(body, charset='utf-8')
+        # 在获取连接锁之前序列化一次；多个收件人共用一次DATA传输，由服务器分发。
+        # sendmail 对bytes原样发送，按SMTP要求使用CRLF换行
+        msg_bytes = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
         
-        # 关闭连接
-        smtp.quit()
+        # 从连接池取已登录的SMTP连接发送邮件
+        with _get_smtp_key_lock(settings):
+            try:
+                smtp = _get_or_open_smtp(settings)
+                smtp.sendmail(email_sender, recipients, msg_bytes)
+                _release_smtp(settings)
+            except Exception:
+                _discard_smtp(settings)
+                raise
         
-        logger.info(f"成功发送邮件提醒至 {recipient_email}")
+        logger.info(f"成功发送邮件提醒至 {', '.join(recipients)}")
         return True
         
     except Exception as e:
         logger.error(f"发送邮件失败: {e}")
         return False
 
-def format_stock_alert_email(alert, ai_analysis=None, user_config: Optional[Dict[str, Any]] = None):
+def format_stock_alert_email(alert, ai_analysis=None):
     """
-    格式化股票价格提醒邮件内容
+    格式化股票价格提醒邮件内容（纯格式化，不进行网络请求；AI分析由调用方预先获取）
     
     参数:
     alert (dict): 警报信息，包含股票代码、名称、价格等信息
-    ai_analysis (str, optional): AI分析结果
-    user_config (dict, optional): 用户配置，用于获取AI API密钥
+    ai_analysis (str, optional): AI分析结果，为空时不包含AI分析部分
     
     返回:
     tuple: (邮件主题, 邮件内容)
     """
-    direction = "上涨" if alert['direction'] == 'UP' else "下跌"
-    direction_symbol = "[UP]" if alert['direction'] == 'UP' else "[DOWN]"
-    
-    subject = f"{direction_symbol} 股票价格提醒: {alert['stock_name']}已{direction}至阈值价格"
-    
-    # 如果没有提供AI分析结果且启用了AI分析，则获取分析
-    if ai_analysis is None:
-        try:
-            ai_analysis = get_basic_ai_analysis(
-                alert['stock_code'], 
-                alert['current_price'], 
-                alert['direction'],
-                user_config
-            )
-        except Exception as e:
-            logger.error(f"获取AI分析时出错: {e}")
-            ai_analysis = "AI分析暂不可用"
+    direction, direction_symbol = _DIRECTION_LABELS['UP' if alert['direction'] == 'UP' else 'DOWN']
+    fields = dict(alert, direction=direction, direction_symbol=direction_symbol)
+    
+    subject = _ALERT_SUBJECT_TMPL.format_map(fields)
     
     # 构建邮件正文
-    body = f"""尊敬的用户：
-
-您关注的股票 {alert['stock_name']}({alert['stock_code']}) 价格已发生重要变动。
-
-当前价格: {alert['current_price']} 
-阈值价格: {alert['threshold']}
-变动方向: {direction} {direction_symbol}
-提醒时间: {alert['timestamp']}
-"""
-
+    body = _ALERT_BODY_TMPL.format_map(fields)
+    
     # 添加AI分析部分
-    if ai_analysis:
-        body += f"""
----------- AI分析 ----------
-{ai_analysis}
-----------------------------
-"""
-
-    body += """
-请及时查看您的股票交易账户，并根据市场情况做出相应决策。
+    ai_part = _ALERT_AI_TMPL.format(ai_analysis=ai_analysis) if ai_analysis else ''
+    
+    return subject, ''.join((body, ai_part, _ALERT_FOOTER))
 
---------------------------------
-此邮件由股票盯盘系统自动发送，请勿回复。
-"""
+def format_stock_alert_digest_email(alerts, ai_analyses=None):
+    """
+    将同一收件人的多条警报格式化为一封汇总邮件（纯格式化，不进行网络请求）
+    
+    参数:
+    alerts (list): 警报列表
+    ai_analyses (list, optional): 与警报一一对应的AI分析结果，为空的项不包含AI分析部分
+    
+    返回:
+    tuple: (邮件主题, 邮件内容)
+    """
+    ai_analyses = ai_analyses or [None] * len(alerts)
+    
+    subject = _DIGEST_SUBJECT_TMPL.format(count=len(alerts))
+    
+    parts = [_DIGEST_HEADER_TMPL.format(count=len(alerts))]
+    for index, (alert, ai_analysis) in enumerate(zip(alerts, ai_analyses), 1):
+        direction, direction_symbol = _DIRECTION_LABELS['UP' if alert['direction'] == 'UP' else 'DOWN']
+        parts.append(_DIGEST_SECTION_TMPL.format_map(
+            dict(alert, index=index, direction=direction, direction_symbol=direction_symbol)
+        ))
+        if ai_analysis:
+            parts.append(_ALERT_AI_TMPL.format(ai_analysis=ai_analysis))
+    parts.append(_ALERT_FOOTER)
     
-    return subject, body 
\ No newline at end of file
+    return subject, ''.join(parts)
@@ -4,46 +4,79 @@
 """
 
 import os
-import json
 import base64
+import hashlib
 import logging
+import threading
+import orjson
+from functools import lru_cache
 from typing import Optional, Dict, Any
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 logger = logging.getLogger('encryption_service')
 
-# 全局加密器实例
+# 全局加密器实例：_aead 用于新数据（AES-256-GCM），_cipher_suite 仅用于解密旧版Fernet数据；
+# cryptography 在首次创建加密器时才导入
+_aead = None
 _cipher_suite = None
+_cipher_lock = threading.Lock()
 
-def _get_encryption_key() -> bytes:
+# AES-GCM密文格式：'v2:' + urlsafe_base64(12字节nonce + 密文 + 16字节认证标签)
+# 不带前缀的密文为旧版格式（双重base64的Fernet令牌）
+_AEAD_PREFIX = 'v2:'
+_AEAD_NONCE_SIZE = 12
+
+# 密钥派生参数
+# 使用固定的主密钥（与项目其他部分保持一致，使用数据库而非环境变量）
+_MASTER_KEY = 'fintech-ai-encryption-master-key-2024-secure'
+_KDF_SALT = b'stock-monitor-salt'  # 在生产环境中应该使用随机盐
+_KDF_ITERATIONS = 100000
+
+@lru_cache(maxsize=1)
+def _derive_key_bytes() -> bytes:
     """
-    获取加密密钥
+    派生32字节原始密钥
     
-    使用固定的主密钥生成加密密钥
+    使用PBKDF2从固定的主密钥派生。派生需要10万轮SHA256，
+    结果在进程内缓存，只计算一次
     """
-    # 使用固定的主密钥（与项目其他部分保持一致，使用数据库而非环境变量）
-    master_key = 'fintech-ai-encryption-master-key-2024-secure'
-    
-    # 使用PBKDF2从主密钥派生加密密钥
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=b'stock-monitor-salt',  # 在生产环境中应该使用随机盐
-        iterations=100000,
-    )
-    key = base64.urlsafe_b64encode(kdf.derive(master_key.encode()))
-    return key
+    # hashlib.pbkdf2_hmac 直接调用OpenSSL实现，与 cryptography 的 PBKDF2HMAC 结果一致
+    return hashlib.pbkdf2_hmac('sha256', _MASTER_KEY.encode(), _KDF_SALT, _KDF_ITERATIONS, dklen=32)
+
+def _get_encryption_key() -> bytes:
+    """
+    获取Fernet格式的加密密钥（base64编码的派生密钥）
+    """
+    return base64.urlsafe_b64encode(_derive_key_bytes())
+
+def _get_aead():
+    """获取AES-GCM加密器实例（多线程首次调用时只创建一次）"""
+    global _aead
+    if _aead is None:
+        with _cipher_lock:
+            if _aead is None:
+                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+                _aead = AESGCM(_derive_key_bytes())
+    return _aead
 
 def _get_cipher():
-    """获取加密器实例"""
+    """获取旧版Fernet加密器实例，仅用于解密历史数据"""
     global _cipher_suite
     if _cipher_suite is None:
-        key = _get_encryption_key()
-        _cipher_suite = Fernet(key)
+        with _cipher_lock:
+            if _cipher_suite is None:
+                from cryptography.fernet import Fernet
+                _cipher_suite = Fernet(_get_encryption_key())
     return _cipher_suite
 
+def _encrypt_bytes(data: bytes) -> str:
+    """
+    使用AES-GCM加密字节数据，返回带版本前缀的base64字符串（异常由调用方处理）
+    """
+    # AES-GCM单次完成加密和认证（AES-NI + PCLMULQDQ），每次使用随机nonce
+    nonce = os.urandom(_AEAD_NONCE_SIZE)
+    encrypted_data = _get_aead().encrypt(nonce, data, None)
+    return _AEAD_PREFIX + base64.urlsafe_b64encode(nonce + encrypted_data).decode()
+
 def encrypt_string(plaintext: str) -> Optional[str]:
     """
     加密字符串
@@ -58,17 +91,35 @@ def encrypt_string(plaintext: str) -> Optional[str]:
         return None
     
     try:
-        cipher = _get_cipher()
-        encrypted_data = cipher.encrypt(plaintext.encode())
-        return base64.urlsafe_b64encode(encrypted_data).decode()
+        return _encrypt_bytes(plaintext.encode())
     except Exception as e:
         logger.error(f"加密字符串失败: {e}")
         return None
 
+@lru_cache(maxsize=2048)
+def _decrypt_cached(encrypted_text: str) -> str:
+    """
+    解密字符串（失败时抛出异常）
+    
+    按密文缓存解密结果：每次加密都使用随机nonce，相同密文必然对应相同明文，缓存无需失效；
+    失败时抛出异常，lru_cache 不会缓存，下次调用会重新尝试
+    """
+    if encrypted_text.startswith(_AEAD_PREFIX):
+        raw = base64.urlsafe_b64decode(encrypted_text[len(_AEAD_PREFIX):].encode())
+        nonce, encrypted_data = raw[:_AEAD_NONCE_SIZE], raw[_AEAD_NONCE_SIZE:]
+        decrypted_data = _get_aead().decrypt(nonce, encrypted_data, None)
+    else:
+        cipher = _get_cipher()
+        encrypted_data = base64.urlsafe_b64decode(encrypted_text.encode())
+        decrypted_data = cipher.decrypt(encrypted_data)
+    return decrypted_data.decode()
+
 def decrypt_string(encrypted_text: str) -> Optional[str]:
     """
     解密字符串
     
+    同时支持新版AES-GCM密文和旧版Fernet密文，只缓存解密成功的结果
+    
     参数:
     encrypted_text (str): 要解密的base64加密字符串
     
@@ -79,10 +130,7 @@ def decrypt_string(encrypted_text: str) -> Optional[str]:
         return None
     
     try:
-        cipher = _get_cipher()
-        encrypted_data = base64.urlsafe_b64decode(encrypted_text.encode())
-        decrypted_data = cipher.decrypt(encrypted_data)
-        return decrypted_data.decode()
+        return _decrypt_cached(encrypted_text)
     except Exception as e:
         logger.error(f"解密字符串失败: {e}")
         return None
@@ -101,8 +149,8 @@ def encrypt_json(data: Dict[str, Any]) -> Optional[str]:
         return None
     
     try:
-        json_string = json.dumps(data, ensure_ascii=False)
-        return encrypt_string(json_string)
+        # orjson直接输出UTF-8字节，无需再编码一次
+        return _encrypt_bytes(orjson.dumps(data))
     except Exception as e:
         logger.error(f"加密JSON数据失败: {e}")
         return None
@@ -123,7 +171,7 @@ def decrypt_json(encrypted_text: str) -> Optional[Dict[str, Any]]:
     try:
         json_string = decrypt_string(encrypted_text)
         if json_string:
-            return json.loads(json_string)
+            return orjson.loads(json_string)
         return None
     except Exception as e:
         logger.error(f"解密JSON数据失败: {e}")
@@ -131,13 +179,12 @@ def decrypt_json(encrypted_text: str) -> Optional[Dict[str, Any]]:
 
 def generate_new_key() -> str:
     """
-    生成新的加密密钥
+    生成新的加密密钥（32字节随机密钥，用于AES-256-GCM）
     
     返回:
     str: 新的base64编码的密钥
     """
-    key = Fernet.generate_key()
-    return base64.urlsafe_b64encode(key).decode()
+    return base64.urlsafe_b64encode(os.urandom(32)).decode()
 
 # 测试函数
 if __name__ == "__main__":
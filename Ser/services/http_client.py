@@ -0,0 +1,34 @@
+"""
+HTTP客户端模块
+进程内共享的 requests.Session，复用到同一API主机的TCP/TLS连接（keep-alive），
+避免每次请求都重新握手
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 连接池大小：pool_connections 为缓存的主机数，pool_maxsize 为每个主机的最大连接数
+_POOL_CONNECTIONS = 16
+_POOL_MAXSIZE = 32
+
+def _create_session() -> requests.Session:
+    """创建挂载了连接池适配器的会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=_POOL_CONNECTIONS, pool_maxsize=_POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# 全局会话实例
+_SESSION = _create_session()
+
+def get_session() -> requests.Session:
+    """
+    获取共享的HTTP会话
+
+    代理、超时等参数请在每次请求时传入，不要修改会话本身的属性
+
+    返回:
+    requests.Session: 共享的HTTP会话
+    """
+    return _SESSION
@@ -1,14 +1,17 @@
-import time
 import logging
-import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from .stock_service import get_stock_price
+import numpy as np
+import orjson
+from .stock_service import get_stock_price, get_stock_prices
 from .watchlist_service import get_watchlist
-from .email_service import send_email_alert, format_stock_alert_email
-from .ai_analysis_service import get_basic_ai_analysis
+from .email_service import send_email_alert, format_stock_alert_email, format_stock_alert_digest_email
+from .ai_analysis_service import get_ai_analysis
 from .alert_manager import is_new_alert, get_recent_alerts
-from .database_service import save_alert_log, init_database
-from .auth_service import get_user_config, get_user_config_by_email
+from .database_service import save_alert_logs_bulk
+from .auth_service import get_user_config_by_email
 
 # 配置日志
 logging.basicConfig(
@@ -25,6 +28,22 @@ logger = logging.getLogger("monitor_service")
 ENABLE_EMAIL_ALERTS = True  # 是否启用邮件提醒
 ENABLE_AI_ANALYSIS = True  # 是否启用AI分析
 
+# 邮件发送（含格式化和SMTP通信）由后台发送线程从队列取出执行，不阻塞价格检查；
+# 发送线程复用连接池中已登录的SMTP连接，不同账号的邮件可以并发发送
+_alert_q = queue.Queue()  # 元素为同一收件人的警报列表
+EMAIL_SENDER_THREADS = 4
+# 同一收件人本轮警报数超过该值时合并为一封汇总邮件
+DIGEST_THRESHOLD = 3
+_email_worker_threads = []
+_email_worker_lock = threading.Lock()
+
+# 警报的AI分析在独立线程池中并发获取，超时后使用默认文案
+_ai_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='alert_ai')
+AI_ANALYSIS_TIMEOUT = 30  # 秒
+
+# 股价获取为网络I/O，使用线程池并发请求；线程数同时限制了对行情接口的并发量
+_price_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='price_fetch')
+
 def check_thresholds():
     """
     检查所有关注股票的价格是否突破阈值
@@ -40,180 +59,269 @@ def check_thresholds():
         logger.info("关注列表为空，无需检查")
         return []
     
-    # 记录突破阈值的股票
+    # 记录突破阈值的股票，及对应的用户配置（用于AI分析）
     alerts = []
+    alert_user_configs = []
+    # 本轮待写入数据库的告警日志
+    pending_alert_logs = []
     
-    # 遍历关注列表
-    for stock in watchlist:
-        stock_code = stock.get('stock_code')
-        stock_name = stock.get('stock_name')
-        upper_threshold = float(stock.get('upper_threshold'))
-        lower_threshold = float(stock.get('lower_threshold'))
-        user_email = stock.get('user_email')
-        
-        logger.info(f"检查股票: {stock_code} ({stock_name})")
-        
-        # 获取用户配置（用于AI分析和股价获取）
-        user_config = get_user_config_by_email(user_email) if user_email else None
-        
-        # 获取当前股价
-        current_price = get_stock_price(stock_code, user_config)
-        
-        # 如果无法获取价格，跳过
-        if current_price is None:
-            logger.warning(f"无法获取股票 {stock_code} 的价格，跳过检查")
-            continue
-        
-        logger.info(f"当前价格: {current_price}, 上限: {upper_threshold}, 下限: {lower_threshold}")
-        
-        # 检查是否突破上限
-        if current_price >= upper_threshold:
-            logger.warning(f"股票 {stock_code} ({stock_name}) 价格 {current_price} 突破上限 {upper_threshold}")
-            
-            # 创建警报对象
-            alert = {
-                'stock_code': stock_code,
-                'stock_name': stock_name,
-                'current_price': current_price,
-                'threshold': upper_threshold,
-                'direction': 'UP',
-                'user_email': user_email,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            # 检查是否是新警报
-            if is_new_alert(stock_code, 'UP', current_price, upper_threshold):
-                # 添加AI分析
-                if ENABLE_AI_ANALYSIS and 'ai_analysis' not in alert:
-                    try:
-                        # 获取用户配置
-                        user_config = get_user_config_by_email(alert.get('user_email')) if alert.get('user_email') else None
-                        # 使用结构化AI分析函数
-                        from .ai_analysis_service import get_ai_analysis
-                        ai_analysis_result = get_ai_analysis(
-                            alert['stock_code'], 
-                            alert.get('triggered_price', alert.get('current_price', 0)), 
-                            'openai',  # 默认使用openai，也可以从用户配置读取
-                            user_config,
-                            {'breakout_direction': 'UP', 'stock_name': alert.get('stock_name', '未知')}
-                        )
-                        
-                        # 如果AI分析成功，保存完整的结构化结果
-                        if ai_analysis_result and not ai_analysis_result.get('error'):
-                            alert['ai_analysis'] = ai_analysis_result
-                        else:
-                            # 如果AI分析失败，保存错误信息的简化版本
-                            alert['ai_analysis'] = ai_analysis_result.get('message', 'AI分析暂不可用')
-                    except Exception as e:
-                        logger.error(f"获取AI分析时出错: {e}")
-                        alert['ai_analysis'] = "AI分析暂不可用"
-                
-                # 保存到数据库
-                try:
-                    # 处理AI分析数据，如果是结构化数据则转换为JSON字符串
-                    ai_analysis_for_db = alert.get('ai_analysis', '')
-                    if isinstance(ai_analysis_for_db, dict):
-                        import json
-                        ai_analysis_for_db = json.dumps(ai_analysis_for_db, ensure_ascii=False)
-                    
-                    alert_data = {
-                        'stock_code': stock_code,
-                        'stock_name': stock_name,
-                        'triggered_price': current_price,
-                        'threshold_price': upper_threshold,
-                        'direction': 'UP',
-                        'ai_analysis': ai_analysis_for_db,
-                        'user_email': user_email,
-                        'alert_timestamp': datetime.now()
-                    }
-                    save_alert_log(alert_data)
-                except Exception as e:
-                    logger.error(f"保存告警日志到数据库失败: {e}")
-                
-                # 添加到警报列表
-                alerts.append(alert)
-                
-                # 发送邮件提醒
-                if ENABLE_EMAIL_ALERTS and user_email:
-                    send_alert_email(alert)
+    # 获取用户配置（用于AI分析和股价获取），每个用户只读取一次
+    configs_by_email = {
+        user_email: get_user_config_by_email(user_email)
+        for user_email in {stock.get('user_email') for stock in watchlist}
+        if user_email
+    }
+    user_configs = [configs_by_email.get(stock.get('user_email')) for stock in watchlist]
+    
+    # 并发获取所有股票的当前股价
+    prices = _fetch_prices(watchlist, user_configs)
+    
+    # 本轮检查的所有警报共用同一时间戳
+    scan_time = datetime.now()
+    scan_ts = scan_time.strftime('%Y-%m-%d %H:%M:%S')
+    
+    # 阈值与价格按列存放为数组，一次向量化比较得到突破掩码（无价格的股票为NaN，比较结果均为False）
+    upper_arr = np.array([float(stock.get('upper_threshold')) for stock in watchlist])
+    lower_arr = np.array([float(stock.get('lower_threshold')) for stock in watchlist])
+    current_arr = np.array([prices.get(index) for index in range(len(watchlist))], dtype=float)
+    
+    for index in np.flatnonzero(np.isnan(current_arr)):
+        logger.warning(f"无法获取股票 {watchlist[index].get('stock_code')} 的价格，跳过检查")
+    
+    up_mask = current_arr >= upper_arr
+    down_mask = ~up_mask & (current_arr <= lower_arr)
+    logger.info("已检查 %d 只股票，突破上限 %d 只，突破下限 %d 只", len(watchlist), up_mask.sum(), down_mask.sum())
+    
+    # 只遍历突破阈值的股票
+    for index in np.flatnonzero(up_mask | down_mask):
+        if up_mask[index]:
+            direction, threshold = 'UP', float(upper_arr[index])
+        else:
+            direction, threshold = 'DOWN', float(lower_arr[index])
         
-        # 检查是否突破下限
-        elif current_price <= lower_threshold:
-            logger.warning(f"股票 {stock_code} ({stock_name}) 价格 {current_price} 突破下限 {lower_threshold}")
+        alert = _handle_breach(watchlist[index], prices[index], threshold, direction, scan_ts)
+        if alert is not None:
+            alerts.append(alert)
+            alert_user_configs.append(user_configs[index])
+    
+    # 并发获取所有新警报的AI分析
+    if ENABLE_AI_ANALYSIS and alerts:
+        futures = {
+            _ai_executor.submit(_get_alert_ai_analysis, alert, user_config): alert
+            for alert, user_config in zip(alerts, alert_user_configs)
+        }
+        try:
+            for future in as_completed(futures, timeout=AI_ANALYSIS_TIMEOUT):
+                futures[future]['ai_analysis'] = future.result()
+        except FutureTimeoutError:
+            # 超时未完成的分析使用默认文案，不阻塞本轮检查
+            for future, alert in futures.items():
+                if 'ai_analysis' in alert:
+                    continue
+                if future.done():
+                    alert['ai_analysis'] = future.result()
+                else:
+                    future.cancel()
+                    logger.warning(f"获取AI分析超时: {alert['stock_code']}")
+                    alert['ai_analysis'] = "AI分析暂不可用"
+    
+    for alert in alerts:
+        # 记录待保存的告警日志（本轮检查结束后批量写入数据库）
+        try:
+            # 处理AI分析数据，如果是结构化数据则转换为JSON字符串
+            ai_analysis_for_db = alert.get('ai_analysis', '')
+            if isinstance(ai_analysis_for_db, dict):
+                ai_analysis_for_db = orjson.dumps(ai_analysis_for_db).decode()
             
-            # 创建警报对象
-            alert = {
-                'stock_code': stock_code,
-                'stock_name': stock_name,
-                'current_price': current_price,
-                'threshold': lower_threshold,
-                'direction': 'DOWN',
-                'user_email': user_email,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            alert_data = {
+                'stock_code': alert['stock_code'],
+                'stock_name': alert['stock_name'],
+                'triggered_price': alert['current_price'],
+                'threshold_price': alert['threshold'],
+                'direction': alert['direction'],
+                'ai_analysis': ai_analysis_for_db,
+                'user_email': alert['user_email'],
+                'alert_timestamp': scan_time
             }
-            
-            # 检查是否是新警报
-            if is_new_alert(stock_code, 'DOWN', current_price, lower_threshold):
-                # 添加AI分析
-                if ENABLE_AI_ANALYSIS and 'ai_analysis' not in alert:
-                    try:
-                        # 获取用户配置
-                        user_config = get_user_config_by_email(alert.get('user_email')) if alert.get('user_email') else None
-                        # 使用结构化AI分析函数
-                        from .ai_analysis_service import get_ai_analysis
-                        ai_analysis_result = get_ai_analysis(
-                            alert['stock_code'], 
-                            alert.get('triggered_price', alert.get('current_price', 0)), 
-                            'openai',  # 默认使用openai，也可以从用户配置读取
-                            user_config,
-                            {'breakout_direction': 'DOWN', 'stock_name': alert.get('stock_name', '未知')}
-                        )
-                        
-                        # 如果AI分析成功，保存完整的结构化结果
-                        if ai_analysis_result and not ai_analysis_result.get('error'):
-                            alert['ai_analysis'] = ai_analysis_result
-                        else:
-                            # 如果AI分析失败，保存错误信息的简化版本
-                            alert['ai_analysis'] = ai_analysis_result.get('message', 'AI分析暂不可用')
-                    except Exception as e:
-                        logger.error(f"获取AI分析时出错: {e}")
-                        alert['ai_analysis'] = "AI分析暂不可用"
-                
-                # 保存到数据库
-                try:
-                    # 处理AI分析数据，如果是结构化数据则转换为JSON字符串
-                    ai_analysis_for_db = alert.get('ai_analysis', '')
-                    if isinstance(ai_analysis_for_db, dict):
-                        import json
-                        ai_analysis_for_db = json.dumps(ai_analysis_for_db, ensure_ascii=False)
-                    
-                    alert_data = {
-                        'stock_code': stock_code,
-                        'stock_name': stock_name,
-                        'triggered_price': current_price,
-                        'threshold_price': lower_threshold,
-                        'direction': 'DOWN',
-                        'ai_analysis': ai_analysis_for_db,
-                        'user_email': user_email,
-                        'alert_timestamp': datetime.now()
-                    }
-                    save_alert_log(alert_data)
-                except Exception as e:
-                    logger.error(f"保存告警日志到数据库失败: {e}")
-                
-                # 添加到警报列表
-                alerts.append(alert)
-                
-                # 发送邮件提醒
-                if ENABLE_EMAIL_ALERTS and user_email:
-                    send_alert_email(alert)
-        
-        # 避免频繁请求API，添加短暂延迟
-        time.sleep(0.5)
+            pending_alert_logs.append(alert_data)
+        except Exception as e:
+            logger.error(f"准备告警日志失败: {e}")
+    
+    # 发送邮件提醒（按收件人分组放入发送队列，警报较多时合并为汇总邮件）
+    if ENABLE_EMAIL_ALERTS:
+        alerts_by_email = {}
+        for alert in alerts:
+            if alert['user_email']:
+                alerts_by_email.setdefault(alert['user_email'], []).append(alert)
+        for user_alerts in alerts_by_email.values():
+            if len(user_alerts) > DIGEST_THRESHOLD:
+                _enqueue_alert_email(user_alerts)
+            else:
+                for alert in user_alerts:
+                    _enqueue_alert_email([alert])
+    
+    # 批量保存本轮告警日志（单个事务）
+    if pending_alert_logs:
+        try:
+            save_alert_logs_bulk(pending_alert_logs)
+        except Exception as e:
+            logger.error(f"保存告警日志到数据库失败: {e}")
     
-    logger.info(f"检查完成，发现 {len(alerts)} 个突破阈值的股票")
+    logger.info("检查完成，发现 %d 个突破阈值的股票", len(alerts))
     return alerts
 
+def _handle_breach(stock, current_price, threshold, direction, timestamp):
+    """
+    处理一只突破阈值的股票，生成警报
+    
+    参数:
+    stock (dict): 关注列表中的股票记录
+    current_price (float): 当前价格
+    threshold (float): 被突破的阈值价格
+    direction (str): 突破方向 ('UP' 或 'DOWN')
+    timestamp (str): 本轮检查的时间戳
+    
+    返回:
+    dict: 警报信息，冷却期内的重复警报返回None
+    """
+    stock_code = stock.get('stock_code')
+    stock_name = stock.get('stock_name')
+    limit_name = '上限' if direction == 'UP' else '下限'
+    logger.warning(f"股票 {stock_code} ({stock_name}) 价格 {current_price} 突破{limit_name} {threshold}")
+    
+    # 检查是否是新警报
+    if not is_new_alert(stock_code, direction, current_price, threshold):
+        return None
+    
+    # 创建警报对象
+    return {
+        'stock_code': stock_code,
+        'stock_name': stock_name,
+        'current_price': current_price,
+        'threshold': threshold,
+        'direction': direction,
+        'user_email': stock.get('user_email'),
+        'timestamp': timestamp
+    }
+
+def _get_alert_ai_analysis(alert, user_config):
+    """
+    获取单个警报的结构化AI分析
+    
+    参数:
+    alert (dict): 警报信息
+    user_config (dict): 用户配置
+    
+    返回:
+    dict|str: 成功时为结构化分析结果，失败时为错误提示文本
+    """
+    try:
+        # 使用结构化AI分析函数
+        ai_analysis_result = get_ai_analysis(
+            alert['stock_code'], 
+            alert.get('triggered_price', alert.get('current_price', 0)), 
+            'openai',  # 默认使用openai，也可以从用户配置读取
+            user_config,
+            {'breakout_direction': alert['direction'], 'stock_name': alert.get('stock_name', '未知')}
+        )
+        
+        # 如果AI分析成功，保存完整的结构化结果
+        if ai_analysis_result and not ai_analysis_result.get('error'):
+            return ai_analysis_result
+        # 如果AI分析失败，保存错误信息的简化版本
+        return ai_analysis_result.get('message', 'AI分析暂不可用')
+    except Exception as e:
+        logger.error(f"获取AI分析时出错: {e}")
+        return "AI分析暂不可用"
+
+def _fetch_prices(watchlist, user_configs):
+    """
+    获取关注列表中所有股票的当前价格
+    
+    按Tushare Token分组批量获取最新价格；批量结果中仍缺失的股票
+    （长期停牌、请求失败等）再并发逐只获取
+    
+    参数:
+    watchlist (list): 关注列表
+    user_configs (list): 与关注列表一一对应的用户配置
+    
+    返回:
+    dict: {关注列表下标: 当前价格}，获取失败的股票价格为None
+    """
+    # 按Token分组（不同用户可能使用不同的Token）
+    groups = {}
+    for index, user_config in enumerate(user_configs):
+        token = user_config.get('tushare_token') if user_config else None
+        groups.setdefault(token, []).append(index)
+    
+    prices = {}
+    batch_futures = {
+        _price_executor.submit(
+            get_stock_prices,
+            list(dict.fromkeys(watchlist[index].get('stock_code') for index in indexes)),
+            user_configs[indexes[0]]
+        ): indexes
+        for indexes in groups.values()
+    }
+    for future in as_completed(batch_futures):
+        try:
+            batch_prices = future.result()
+        except Exception as e:
+            logger.error(f"批量获取股票价格时出错: {e}")
+            continue
+        for index in batch_futures[future]:
+            price = batch_prices.get(watchlist[index].get('stock_code'))
+            if price is not None:
+                prices[index] = price
+    
+    # 批量未命中的股票逐只获取
+    futures = {
+        _price_executor.submit(get_stock_price, stock.get('stock_code'), user_configs[index]): index
+        for index, stock in enumerate(watchlist) if index not in prices
+    }
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            prices[index] = future.result()
+        except Exception as e:
+            logger.error(f"获取股票 {watchlist[index].get('stock_code')} 价格时出错: {e}")
+            prices[index] = None
+    return prices
+
+def _email_worker():
+    """
+    邮件发送线程：从队列依次取出警报并发送（多条警报发送汇总邮件）
+    """
+    while True:
+        alerts = _alert_q.get()
+        try:
+            if len(alerts) == 1:
+                send_alert_email(alerts[0])
+            else:
+                send_alert_digest_email(alerts)
+        except Exception as e:
+            logger.error(f"邮件发送线程处理警报时出错: {e}")
+        finally:
+            _alert_q.task_done()
+
+def _enqueue_alert_email(alerts):
+    """
+    将警报放入邮件发送队列（首次调用时启动发送线程）
+    
+    参数:
+    alerts (list): 同一收件人的警报列表，多于一条时发送汇总邮件
+    """
+    if not _email_worker_threads:
+        with _email_worker_lock:
+            if not _email_worker_threads:
+                for i in range(EMAIL_SENDER_THREADS):
+                    worker = threading.Thread(
+                        target=_email_worker, name=f'alert_email_{i}', daemon=True
+                    )
+                    worker.start()
+                    _email_worker_threads.append(worker)
+    _alert_q.put(alerts)
+
 def send_alert_email(alert):
     """
     发送股票价格提醒邮件
@@ -227,17 +335,15 @@ def send_alert_email(alert):
             logger.warning("用户邮箱为空，无法发送提醒")
             return False
         
-        # 获取AI分析结果
-        ai_analysis = alert.get('ai_analysis')
+        # 格式化邮件内容（AI分析已在检查阶段获取）
+        subject, body = format_stock_alert_email(alert, alert.get('ai_analysis'))
         
-        # 格式化邮件内容
-        subject, body = format_stock_alert_email(alert, ai_analysis)
-        
-        # 发送邮件
-        success = send_email_alert(user_email, subject, body)
+        # 发送邮件（使用收件人自己配置的SMTP账号）
+        user_config = get_user_config_by_email(user_email)
+        success = send_email_alert(user_email, subject, body, user_config)
         
         if success:
-            logger.info(f"成功发送价格提醒至 {user_email}")
+            logger.info("成功发送价格提醒至 %s", user_email)
         else:
             logger.error(f"发送价格提醒至 {user_email} 失败")
         
@@ -246,6 +352,37 @@ def send_alert_email(alert):
         logger.error(f"发送提醒邮件时出错: {e}")
         return False
 
+def send_alert_digest_email(alerts):
+    """
+    将同一收件人的多条警报合并为一封邮件发送
+    
+    参数:
+    alerts (list): 同一收件人的警报列表
+    """
+    try:
+        user_email = alerts[0]['user_email']
+        if not user_email:
+            logger.warning("用户邮箱为空，无法发送提醒")
+            return False
+        
+        # 格式化邮件内容（AI分析已在检查阶段获取）
+        ai_analyses = [alert.get('ai_analysis') for alert in alerts]
+        subject, body = format_stock_alert_digest_email(alerts, ai_analyses)
+        
+        # 发送邮件（使用收件人自己配置的SMTP账号）
+        user_config = get_user_config_by_email(user_email)
+        success = send_email_alert(user_email, subject, body, user_config)
+        
+        if success:
+            logger.info("成功发送 %d 条价格提醒的汇总邮件至 %s", len(alerts), user_email)
+        else:
+            logger.error(f"发送汇总提醒邮件至 {user_email} 失败")
+        
+        return success
+    except Exception as e:
+        logger.error(f"发送汇总提醒邮件时出错: {e}")
+        return False
+
 def check_and_get_alerts():
     """
     检查股票价格并返回警报信息（用于API端点）
@@ -260,15 +397,19 @@ def check_and_get_alerts():
     if not new_alerts:
         recent_alerts = get_recent_alerts(minutes=10)
         
+        # 读取一次关注列表并按股票代码建立索引（同一代码取第一条）
+        watchlist_by_code = {}
+        if recent_alerts:
+            for stock in get_watchlist():
+                watchlist_by_code.setdefault(stock.get('stock_code'), stock)
+        
         # 为最近的警报添加更多信息
         for alert in recent_alerts:
             # 添加股票名称
-            watchlist = get_watchlist()
-            for stock in watchlist:
-                if stock.get('stock_code') == alert['stock_code']:
-                    alert['stock_name'] = stock.get('stock_name')
-                    alert['user_email'] = stock.get('user_email')
-                    break
+            stock = watchlist_by_code.get(alert['stock_code'])
+            if stock:
+                alert['stock_name'] = stock.get('stock_name')
+                alert['user_email'] = stock.get('user_email')
             
             # 添加AI分析（如果启用）
             if ENABLE_AI_ANALYSIS and 'ai_analysis' not in alert:
@@ -276,7 +417,6 @@ def check_and_get_alerts():
                     # 获取用户配置
                     user_config = get_user_config_by_email(alert.get('user_email')) if alert.get('user_email') else None
                     # 使用结构化AI分析函数
-                    from .ai_analysis_service import get_ai_analysis
                     ai_analysis_result = get_ai_analysis(
                         alert['stock_code'], 
                         alert.get('triggered_price', alert.get('current_price', 0)), 
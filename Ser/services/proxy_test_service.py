@@ -5,14 +5,24 @@
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import logging
+import re
 import time
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
 from datetime import datetime
 
 logger = logging.getLogger('proxy_test_service')
 
+# 响应时间测试：采样次数及每次采样的超时（秒），各次采样并发进行
+RESPONSE_TIME_SAMPLES = 3
+RESPONSE_TIME_SAMPLE_TIMEOUT = 5
+
+# 代理配置校验规则（模块加载时构建一次）
+_ALLOWED_PROTOCOLS = frozenset({'http', 'https', 'socks5'})
+_PORT_PATTERN = re.compile(r'[0-9]+')
+
 def test_proxy_connectivity(proxy_settings: Dict[str, Any]) -> Dict[str, Any]:
     """
     测试代理连通性
@@ -51,23 +61,20 @@ def test_proxy_connectivity(proxy_settings: Dict[str, Any]) -> Dict[str, Any]:
         
         logger.info(f"使用代理: {proxy_settings.get('host')}:{proxy_settings.get('port')}")
         
-        # 执行各项测试
-        test_results = []
-        start_time = time.time()
-        
-        # 1. IP获取测试
-        ip_test = _test_ip_check(proxies)
-        test_results.append(ip_test)
-        
-        # 2. HTTPS连接测试
-        https_test = _test_https_connection(proxies)
-        test_results.append(https_test)
+        # 并发执行各项测试（相互独立，总耗时取决于最慢的一项）
+        # 1. IP获取测试  2. HTTPS连接测试  3. 响应时间测试
+        start_time = time.perf_counter()
         
-        # 3. 响应时间测试
-        speed_test = _test_response_time(proxies)
-        test_results.append(speed_test)
+        with _create_proxy_session(proxies) as session, \
+                ThreadPoolExecutor(max_workers=3, thread_name_prefix='proxy_test') as executor:
+            futures = [
+                executor.submit(test_func, session)
+                for test_func in (_test_ip_check, _test_https_connection, _test_response_time)
+            ]
+            # 按提交顺序收集结果，保持返回的测试顺序不变
+            test_results = [future.result() for future in futures]
         
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         
         # 统计结果
         successful_tests = sum(1 for test in test_results if test['success'])
@@ -129,16 +136,15 @@ def validate_proxy_settings(proxy_settings: Dict[str, Any]) -> Dict[str, Any]:
     if not proxy_settings.get('port'):
         errors.append('代理端口不能为空')
     else:
-        try:
-            port = int(proxy_settings['port'])
-            if not (1 <= port <= 65535):
-                errors.append('代理端口必须在1-65535范围内')
-        except (ValueError, TypeError):
+        port = str(proxy_settings['port'])
+        if not _PORT_PATTERN.fullmatch(port):
             errors.append('代理端口必须是有效的数字')
+        elif not (1 <= int(port) <= 65535):
+            errors.append('代理端口必须在1-65535范围内')
     
     # 检查协议
     protocol = proxy_settings.get('protocol', 'http')
-    if protocol not in ['http', 'https', 'socks5']:
+    if not isinstance(protocol, str) or protocol not in _ALLOWED_PROTOCOLS:
         errors.append('代理协议必须是http、https或socks5')
     
     # 检查认证信息（如果有）
@@ -167,21 +173,31 @@ def _build_proxy_url(proxy_settings: Dict[str, Any]) -> str:
     else:
         return f"{protocol}://{host}:{port}"
 
-def _test_ip_check(proxies: Dict[str, str]) -> Dict[str, Any]:
+def _create_proxy_session(proxies: Dict[str, str]) -> requests.Session:
+    """
+    创建本次测试共用的HTTP会话
+    
+    各项测试经同一连接池发出请求，到同一主机的代理隧道和TLS握手只需建立一次
+    """
+    session = requests.Session()
+    # 连接数上限：IP获取、HTTPS连接两项测试各一个，响应时间测试每次采样一个
+    session.mount('https://', HTTPAdapter(pool_connections=3, pool_maxsize=2 + RESPONSE_TIME_SAMPLES))
+    session.proxies.update(proxies)
+    session.verify = False  # 对于测试，忽略SSL验证
+    # 不读取环境变量中的代理设置，否则会覆盖会话上配置的待测代理
+    session.trust_env = False
+    return session
+
+def _test_ip_check(session: requests.Session) -> Dict[str, Any]:
     """测试IP获取"""
     test_name = "IP获取测试"
     try:
         logger.info(f"执行{test_name}...")
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        response = requests.get(
-            'https://httpbin.org/ip',
-            proxies=proxies,
-            timeout=10,
-            verify=False  # 对于测试，忽略SSL验证
-        )
+        response = session.get('https://httpbin.org/ip', timeout=10)
         
-        response_time = round((time.time() - start_time) * 1000)
+        response_time = round((time.perf_counter() - start_time) * 1000)
         
         if response.status_code == 200:
             data = response.json()
@@ -221,21 +237,16 @@ def _test_ip_check(proxies: Dict[str, str]) -> Dict[str, Any]:
             'error': f'测试异常: {str(e)}'
         }
 
-def _test_https_connection(proxies: Dict[str, str]) -> Dict[str, Any]:
+def _test_https_connection(session: requests.Session) -> Dict[str, Any]:
     """测试HTTPS连接"""
     test_name = "HTTPS连接测试"
     try:
         logger.info(f"执行{test_name}...")
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        response = requests.get(
-            'https://www.google.com',
-            proxies=proxies,
-            timeout=10,
-            verify=False  # 对于测试，忽略SSL验证
-        )
+        response = session.get('https://www.google.com', timeout=10)
         
-        response_time = round((time.time() - start_time) * 1000)
+        response_time = round((time.perf_counter() - start_time) * 1000)
         
         if response.status_code == 200:
             logger.info(f"{test_name}成功")
@@ -273,34 +284,38 @@ def _test_https_connection(proxies: Dict[str, str]) -> Dict[str, Any]:
             'error': f'测试异常: {str(e)}'
         }
 
-def _test_response_time(proxies: Dict[str, str]) -> Dict[str, Any]:
+def _sample_response_time(session: requests.Session) -> tuple:
+    """
+    进行一次响应时间采样
+    
+    返回:
+    tuple: (HTTP状态码, 响应时间毫秒)
+    """
+    start_time = time.perf_counter()
+    response = session.get('https://httpbin.org/status/200', timeout=RESPONSE_TIME_SAMPLE_TIMEOUT)
+    return response.status_code, round((time.perf_counter() - start_time) * 1000)
+
+def _test_response_time(session: requests.Session) -> Dict[str, Any]:
     """测试响应时间"""
     test_name = "响应时间测试"
     try:
         logger.info(f"执行{test_name}...")
         
-        # 进行3次测试取平均值
+        # 并发进行多次采样取平均值，每次采样各自限时；任意一次失败或超时则测试失败
+        with ThreadPoolExecutor(max_workers=RESPONSE_TIME_SAMPLES, thread_name_prefix='proxy_sample') as executor:
+            futures = [executor.submit(_sample_response_time, session) for _ in range(RESPONSE_TIME_SAMPLES)]
+            samples = [future.result() for future in futures]
+        
         response_times = []
-        for i in range(3):
-            start_time = time.time()
-            
-            response = requests.get(
-                'https://httpbin.org/status/200',
-                proxies=proxies,
-                timeout=5,
-                verify=False
-            )
-            
-            if response.status_code == 200:
-                response_time = round((time.time() - start_time) * 1000)
-                response_times.append(response_time)
-            else:
+        for status_code, response_time in samples:
+            if status_code != 200:
                 # 如果有任何一次失败，返回失败
                 return {
                     'test': test_name,
                     'success': False,
-                    'error': f'HTTP {response.status_code}'
+                    'error': f'HTTP {status_code}'
                 }
+            response_times.append(response_time)
         
         avg_response_time = round(sum(response_times) / len(response_times))
         
@@ -1,42 +1,185 @@
+import os
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import tushare as ts
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, time as dt_time
 from typing import Optional, Dict, Any
 import akshare as ak
+import orjson
+from .http_client import get_session
 
 # 全局变量用于缓存股票列表
 _cached_stock_list = None
-_cache_timestamp = None
+_cache_timestamp = None  # time.monotonic() 时间
+_stock_list_lock = threading.Lock()  # 保证缓存失效时只有一个线程刷新股票列表
 CACHE_EXPIRY_HOURS = 24  # 缓存24小时
+# 股票列表磁盘缓存，进程重启后在有效期内直接读取，无需重新请求
+STOCK_LIST_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'stock_list.pkl')
 
-# 初始化tushare
-def init_tushare(user_config: Optional[Dict[str, Any]] = None):
+class _TokenBucket:
     """
-    初始化tushare API
+    令牌桶限流器（线程安全）
+    
+    按固定速率补充令牌，允许短时突发；令牌耗尽时 acquire 阻塞到有可用令牌为止
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，必要时等待"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        # 在锁外等待：预占的令牌保证后续调用者依次排在后面
+        if wait > 0:
+            time.sleep(wait)
+
+# Tushare行情接口限流（按接口主机），只在配额耗尽时等待，取代固定的请求间隔
+TUSHARE_RATE_PER_SECOND = 8  # 约500次/分钟
+_tushare_bucket = _TokenBucket(TUSHARE_RATE_PER_SECOND, capacity=TUSHARE_RATE_PER_SECOND)
+
+# Tushare数据接口地址（与 tushare.pro.client.DataApi 一致）
+TUSHARE_API_URL = 'http://api.waditu.com/dataapi'
+
+def _tushare_request(token: str, api_name: str, fields: str = '', **params):
+    """
+    直接调用Tushare数据接口，返回原始的字段列表和数据行
+    
+    绕过SDK构造DataFrame，直接用orjson解析响应，并通过共享的HTTP会话复用连接
     
     参数:
-    user_config (dict, optional): 用户配置，包含tushare_token
+    token (str): Tushare Token
+    api_name (str): 接口名称，例如'daily'
+    fields (str): 返回字段，逗号分隔
+    **params: 接口参数
     
     返回:
-    bool: 初始化是否成功
+    tuple: (字段名列表, 数据行列表)
+    """
+    payload = {
+        'api_name': api_name,
+        'token': token,
+        'params': params,
+        'fields': fields
+    }
+    response = get_session().post(f"{TUSHARE_API_URL}/{api_name}", json=payload, timeout=30)
+    response.raise_for_status()
+    result = orjson.loads(response.content)
+    if result['code'] != 0:
+        raise Exception(result['msg'])
+    return result['data']['fields'], result['data']['items']
+
+def _tushare_query(token: str, api_name: str, fields: str = '', **params):
     """
-    # 优先使用用户配置的token，否则使用全局配置
-    token = None
-    if user_config and user_config.get('tushare_token'):
-        token = user_config['tushare_token']
+    直接调用Tushare数据接口，返回行记录列表（适合行情查询等少量数据）
     
+    返回:
+    list: 每行一个dict，键为字段名
+    """
+    columns, items = _tushare_request(token, api_name, fields, **params)
+    return [dict(zip(columns, item)) for item in items]
+
+def _get_tushare_token(user_config: Optional[Dict[str, Any]] = None):
+    """
+    获取用户配置的Tushare Token，未配置时打印警告并返回None
+    """
+    token = user_config.get('tushare_token') if user_config else None
     if not token:
-        print(f"警告: 未设置TUSHARE_TOKEN。用户配置token: {'有' if user_config and user_config.get('tushare_token') else '无'}")
-        return False
+        print("警告: 未设置TUSHARE_TOKEN。用户配置token: 无")
+        return None
+    return token
+
+# 股价缓存：股票代码 -> (价格, 过期时间)，监控高频检查时短时间内不重复请求
+PRICE_CACHE_TTL = 30  # 秒，交易时段
+PRICE_CACHE_TTL_OFF_HOURS = 3600  # 秒，非交易时段价格不再变化，缓存时间可以更长
+_price_cache: Dict[str, tuple] = {}
+_price_cache_lock = threading.Lock()
+
+# A股交易时段（北京时间，无夏令时）
+_MARKET_TZ = timezone(timedelta(hours=8))
+_MARKET_OPEN = dt_time(9, 30)
+_MARKET_CLOSE = dt_time(15, 0)
+
+def _price_cache_ttl():
+    """当前应使用的缓存时长（秒）：交易时段较短，非交易时段较长但不跨过下一次开盘"""
+    now = datetime.now(_MARKET_TZ)
+    if _MARKET_OPEN <= now.time() < _MARKET_CLOSE:
+        return PRICE_CACHE_TTL
+    if now.time() < _MARKET_OPEN:
+        market_open = datetime.combine(now.date(), _MARKET_OPEN, tzinfo=_MARKET_TZ)
+        return min(PRICE_CACHE_TTL_OFF_HOURS, (market_open - now).total_seconds())
+    return PRICE_CACHE_TTL_OFF_HOURS
+
+def _price_cache_get(stock_code):
+    """读取未过期的缓存价格，不存在或已过期时返回None"""
+    with _price_cache_lock:
+        entry = _price_cache.get(stock_code)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+def _price_cache_put(stock_code, price):
+    """写入价格缓存"""
+    with _price_cache_lock:
+        _price_cache[stock_code] = (price, time.monotonic() + _price_cache_ttl())
+
+def _load_stock_list_from_disk():
+    """
+    读取未过期的股票列表磁盘缓存
     
-    print(f"使用Tushare Token: {token[:4]}***")
+    返回:
+    tuple: (股票列表DataFrame, 换算为 time.monotonic() 的写入时间)，文件不存在、已过期或读取失败时返回None
+    """
     try:
-        ts.set_token(token)
-        return True
+        age = time.time() - os.path.getmtime(STOCK_LIST_CACHE_PATH)
+    except OSError:
+        return None
+    if age >= CACHE_EXPIRY_HOURS * 3600:
+        return None
+    try:
+        return pd.read_pickle(STOCK_LIST_CACHE_PATH), time.monotonic() - age
     except Exception as e:
-        print(f"Tushare初始化失败: {e}")
-        return False
+        print(f"读取股票列表磁盘缓存失败: {e}")
+        return None
+
+def _save_stock_list_to_disk(all_stocks):
+    """将股票列表写入磁盘缓存（先写临时文件再替换，避免读到写了一半的文件）"""
+    try:
+        os.makedirs(os.path.dirname(STOCK_LIST_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{STOCK_LIST_CACHE_PATH}.tmp"
+        all_stocks.to_pickle(tmp_path)
+        os.replace(tmp_path, STOCK_LIST_CACHE_PATH)
+    except Exception as e:
+        print(f"保存股票列表磁盘缓存失败: {e}")
+
+def clear_stock_list_cache():
+    """
+    清除股票列表缓存：内存缓存、股票搜索索引及磁盘缓存文件
+    
+    下一次 get_all_stocks / 股票搜索会重新请求数据
+    """
+    global _cached_stock_list, _cache_timestamp, _search_index, _search_index_timestamp
+    
+    with _stock_list_lock:
+        _cached_stock_list = None
+        _cache_timestamp = None
+        with _search_index_lock:
+            _search_index = None
+            _search_index_timestamp = None
+        try:
+            os.remove(STOCK_LIST_CACHE_PATH)
+        except FileNotFoundError:
+            pass
 
 def get_all_stocks(user_config: Optional[Dict[str, Any]] = None):
     """
@@ -48,44 +191,67 @@ def get_all_stocks(user_config: Optional[Dict[str, Any]] = None):
     返回:
     pd.DataFrame: 包含股票代码和名称的DataFrame，失败时返回None
     """
-    global _cached_stock_list, _cache_timestamp
+    # 快速路径：缓存有效时直接返回，无需加锁
+    cached_stock_list = _get_cached_stock_list()
+    if cached_stock_list is not None:
+        return cached_stock_list
     
-    # 检查缓存是否有效
+    # 缓存失效时只由一个线程刷新，其他线程等待后直接使用刷新结果，避免重复请求
+    with _stock_list_lock:
+        cached_stock_list = _get_cached_stock_list()
+        if cached_stock_list is not None:
+            return cached_stock_list
+        return _refresh_stock_list(user_config)
+
+def _get_cached_stock_list():
+    """获取未过期的内存缓存，过期或尚未缓存时返回None"""
     if (_cached_stock_list is not None and 
         _cache_timestamp is not None and 
-        datetime.now().timestamp() - _cache_timestamp < CACHE_EXPIRY_HOURS * 3600):
+        time.monotonic() - _cache_timestamp < CACHE_EXPIRY_HOURS * 3600):
+        return _cached_stock_list
+    return None
+
+def _refresh_stock_list(user_config: Optional[Dict[str, Any]] = None):
+    """
+    刷新股票列表缓存（调用方需持有 _stock_list_lock）：优先读取磁盘缓存，否则请求Tushare
+    
+    返回:
+    pd.DataFrame: 股票列表，失败时返回None
+    """
+    global _cached_stock_list, _cache_timestamp
+    
+    # 内存缓存失效时优先读取磁盘缓存
+    disk_cache = _load_stock_list_from_disk()
+    if disk_cache is not None:
+        _cached_stock_list, _cache_timestamp = disk_cache
         return _cached_stock_list
     
     try:
-        # 初始化tushare
-        if not init_tushare(user_config):
+        # 获取Tushare Token
+        token = _get_tushare_token(user_config)
+        if token is None:
             print("Tushare初始化失败，无法获取股票列表")
             return None
         
-        # 创建tushare pro API接口
-        pro = ts.pro_api()
-        
-        # 获取股票基本信息
+        # 获取股票基本信息（上交所和深交所两个请求并发进行，只返回需要的字段）
         # exchange: 'SSE'上交所 'SZSE'深交所
-        stock_list = []
-        
-        # 获取上交所股票
-        df_sse = pro.stock_basic(exchange='SSE', list_status='L')
-        if not df_sse.empty:
-            stock_list.append(df_sse[['ts_code', 'name']])
-        
-        # 获取深交所股票
-        df_szse = pro.stock_basic(exchange='SZSE', list_status='L')
-        if not df_szse.empty:
-            stock_list.append(df_szse[['ts_code', 'name']])
-        
-        # 合并数据
-        if stock_list:
-            all_stocks = pd.concat(stock_list, ignore_index=True)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(_tushare_request, token, 'stock_basic', fields='ts_code,name',
+                                exchange=exchange, list_status='L')
+                for exchange in ('SSE', 'SZSE')
+            ]
+            responses = [future.result() for future in futures]
+        
+        # 合并数据：两个交易所的数据行直接拼接，一次构造DataFrame
+        items = [item for _, exchange_items in responses for item in exchange_items]
+        if items:
+            all_stocks = pd.DataFrame(items, columns=responses[0][0])[['ts_code', 'name']]
             
             # 缓存结果
             _cached_stock_list = all_stocks
-            _cache_timestamp = datetime.now().timestamp()
+            _cache_timestamp = time.monotonic()
+            _save_stock_list_to_disk(all_stocks)
             
             return all_stocks
         else:
@@ -150,6 +316,121 @@ def search_stocks(query, limit=20, user_config: Optional[Dict[str, Any]] = None)
     #     print(f"搜索股票时出错: {e}")
     #     return []
 
+def _format_stock_code(stock_code: str) -> str:
+    """为不带后缀的股票代码按代码规则添加交易所后缀"""
+    if '.' in stock_code:
+        return stock_code
+    if stock_code.startswith('6'):
+        return f"{stock_code}.SH"  # 上海股票
+    if stock_code.startswith('0') or stock_code.startswith('3'):
+        return f"{stock_code}.SZ"  # 深圳股票
+    if stock_code.startswith('8') or stock_code.startswith('4'):
+        return f"{stock_code}.BJ"  # 北交所（如果支持）
+    return stock_code
+
+# AKShare股票列表的搜索索引，与股票列表缓存使用相同的过期时间
+_search_index = None
+_search_index_timestamp = None
+_search_index_lock = threading.Lock()
+
+def _get_cached_search_index():
+    """获取未过期的搜索索引，过期或尚未建立时返回None"""
+    with _search_index_lock:
+        if (_search_index is not None and
+                time.monotonic() - _search_index_timestamp < CACHE_EXPIRY_HOURS * 3600):
+            return _search_index
+        return None
+
+def _build_search_index(codes, names):
+    """
+    为股票列表建立倒排索引并缓存
+    
+    代码索引以代码的每个子串为键，值为按原始顺序排列的行号列表，代码匹配只需一次字典查找；
+    名称索引以名称中的单字和相邻二字为键，值为行号集合，查询时对各二字的集合求交集得到
+    少量候选，再逐个确认子串匹配
+    
+    参数:
+    codes (list): 股票代码（不带后缀）
+    names (list): 股票名称，与 codes 一一对应
+    
+    返回:
+    dict: 搜索索引
+    """
+    global _search_index, _search_index_timestamp
+    
+    code_index = {}
+    for row, code in enumerate(codes):
+        code_upper = code.upper()
+        substrings = {
+            code_upper[start:end]
+            for start in range(len(code_upper))
+            for end in range(start + 1, len(code_upper) + 1)
+        }
+        for substring in substrings:
+            code_index.setdefault(substring, []).append(row)
+    
+    names_upper = [name.upper() for name in names]
+    name_index = {}
+    for row, name_upper in enumerate(names_upper):
+        grams = set(name_upper)
+        grams.update(name_upper[i:i + 2] for i in range(len(name_upper) - 1))
+        for gram in grams:
+            name_index.setdefault(gram, set()).add(row)
+    
+    search_index = {
+        'codes': [_format_stock_code(code) for code in codes],
+        'names': names,
+        'names_upper': names_upper,
+        'code_index': code_index,
+        'name_index': name_index
+    }
+    with _search_index_lock:
+        _search_index = search_index
+        _search_index_timestamp = time.monotonic()
+    return search_index
+
+def _search_index_lookup(search_index, keyword_upper, limit):
+    """
+    在搜索索引中查找匹配的股票：代码匹配优先，名称匹配补足剩余数量
+    
+    参数:
+    search_index (dict): _build_search_index 建立的索引
+    keyword_upper (str): 已去除首尾空白并转为大写的关键词
+    limit (int): 最大返回数量
+    
+    返回:
+    list: 匹配结果，格式同 search_stocks_akshare 的 data 列表
+    """
+    code_matches = search_index['code_index'].get(keyword_upper, [])
+    rows = [(row, 'code') for row in code_matches[:limit]]
+    
+    remaining = limit - len(rows)
+    if remaining > 0:
+        name_index = search_index['name_index']
+        if len(keyword_upper) == 1:
+            candidates = name_index.get(keyword_upper, set())
+        else:
+            postings = [name_index.get(keyword_upper[i:i + 2]) for i in range(len(keyword_upper) - 1)]
+            if all(postings):
+                candidates = set.intersection(*sorted(postings, key=len))
+            else:
+                candidates = set()
+        
+        # 名称匹配只考虑代码未匹配的股票，候选需确认完整子串匹配
+        code_match_set = set(code_matches)
+        names_upper = search_index['names_upper']
+        name_matches = sorted(
+            row for row in candidates
+            if row not in code_match_set and keyword_upper in names_upper[row]
+        )
+        rows.extend((row, 'name') for row in name_matches[:remaining])
+    
+    codes, names = search_index['codes'], search_index['names']
+    return [
+        {'stock_code': codes[row], 'stock_name': names[row], 'match_type': match_type}
+        for row, match_type in rows
+    ]
+
 # 新增：基于AKShare的股票搜索函数
 def search_stocks_akshare(keyword: str, limit: int = 20) -> Dict[str, Any]:
     """
@@ -157,90 +438,64 @@ def search_stocks_akshare(keyword: str, limit: int = 20) -> Dict[str, Any]:
     返回格式: {'success': bool, 'data': list, 'message': str, 'error': str | None}
     data 列表内元素格式: {'stock_code': str, 'stock_name': str, 'match_type': str}
     """
+    return _search_stocks_akshare_normalized(keyword.strip().upper(), limit)
+
+def _search_stocks_akshare_normalized(keyword: str, limit: int = 20) -> Dict[str, Any]:
+    """
+    search_stocks_akshare 的实现，关键词须已去除首尾空白并转为大写
+    
+    已完成规范化的调用方（API层、批量搜索）直接调用，避免重复处理关键词
+    """
     results = []
-    keyword = keyword.strip()
     if not keyword:
         return {'success': True, 'data': [], 'message': '关键词为空', 'error': None}
 
     try:
         print(f"AKShare 正在搜索: {keyword}")
         
-        # 使用 ak.stock_info_a_code_name 获取A股股票基本信息
-        # 这个函数返回包含所有A股代码和名称的DataFrame
-        stock_df = ak.stock_info_a_code_name()
-        
-        if stock_df.empty:
-            return {'success': True, 'data': [], 'message': f"AKShare返回空数据", 'error': None}
+        # 搜索索引过期或尚未建立时，重新获取股票列表并建立索引
+        search_index = _get_cached_search_index()
+        if search_index is None:
+            # 使用 ak.stock_info_a_code_name 获取A股股票基本信息
+            # 这个函数返回包含所有A股代码和名称的DataFrame
+            stock_df = ak.stock_info_a_code_name()
+            
+            if stock_df.empty:
+                return {'success': True, 'data': [], 'message': f"AKShare返回空数据", 'error': None}
 
-        print(f"AKShare 获取到 {len(stock_df)} 只股票数据，开始搜索匹配")
-        
-        # 确保DataFrame有我们需要的列
-        # stock_info_a_code_name 通常返回的列包括: code, name, 等
-        if 'code' not in stock_df.columns or 'name' not in stock_df.columns:
-            # 尝试其他可能的列名
-            available_columns = stock_df.columns.tolist()
-            print(f"AKShare 返回的列名: {available_columns}")
+            print(f"AKShare 获取到 {len(stock_df)} 只股票数据，建立搜索索引")
             
-            # 常见的列名映射
-            code_col = None
-            name_col = None
+            # 确保DataFrame有我们需要的列
+            # stock_info_a_code_name 通常返回的列包括: code, name, 等
+            if 'code' not in stock_df.columns or 'name' not in stock_df.columns:
+                # 尝试其他可能的列名
+                available_columns = stock_df.columns.tolist()
+                print(f"AKShare 返回的列名: {available_columns}")
             
-            for col in available_columns:
-                if col.lower() in ['code', 'stock_code', 'symbol', '股票代码', '代码']:
-                    code_col = col
-                elif col.lower() in ['name', 'stock_name', '股票名称', '名称', '简称']:
-                    name_col = col
+                # 常见的列名映射
+                code_col = None
+                name_col = None
             
-            if not code_col or not name_col:
-                return {'success': False, 'data': [], 'message': f'AKShare数据格式不符合预期，可用列: {available_columns}', 'error': 'AKSHARE_DATA_FORMAT_ERROR'}
-        else:
-            code_col = 'code'
-            name_col = 'name'
+                for col in available_columns:
+                    if col.lower() in ['code', 'stock_code', 'symbol', '股票代码', '代码']:
+                        code_col = col
+                    elif col.lower() in ['name', 'stock_name', '股票名称', '名称', '简称']:
+                        name_col = col
+            
+                if not code_col or not name_col:
+                    return {'success': False, 'data': [], 'message': f'AKShare数据格式不符合预期，可用列: {available_columns}', 'error': 'AKSHARE_DATA_FORMAT_ERROR'}
+            else:
+                code_col = 'code'
+                name_col = 'name'
 
-        matched_count = 0
-        keyword_upper = keyword.upper()
-        
-        # 在股票数据中搜索匹配项
-        for _, row in stock_df.iterrows():
-            stock_code = str(row[code_col]).strip()
-            stock_name = str(row[name_col]).strip()
+            codes = stock_df[code_col].astype(str).str.strip()
+            names = stock_df[name_col].astype(str).str.strip()
             
             # 跳过无效数据
-            if not stock_code or not stock_name or stock_code == 'nan' or stock_name == 'nan':
-                continue
-            
-            match_type = 'unknown'
-            is_match = False
-            
-            # 判断匹配类型和是否匹配
-            if keyword_upper in stock_code.upper():
-                match_type = 'code'
-                is_match = True
-            elif keyword_upper in stock_name.upper():
-                match_type = 'name' 
-                is_match = True
-            
-            if is_match:
-                # 格式化股票代码为标准格式 (例如: 600000.SH, 000001.SZ)
-                formatted_code = stock_code
-                if '.' not in stock_code:
-                    # 如果代码没有后缀，根据代码规则添加
-                    if stock_code.startswith('6'):
-                        formatted_code = f"{stock_code}.SH"  # 上海股票
-                    elif stock_code.startswith('0') or stock_code.startswith('3'):
-                        formatted_code = f"{stock_code}.SZ"  # 深圳股票
-                    elif stock_code.startswith('8') or stock_code.startswith('4'):
-                        formatted_code = f"{stock_code}.BJ"  # 北交所（如果支持）
-                
-                results.append({
-                    'stock_code': formatted_code,
-                    'stock_name': stock_name,
-                    'match_type': match_type
-                })
-                matched_count += 1
-                
-                if matched_count >= limit:
-                    break
+            valid_mask = (codes != '') & (names != '') & (codes != 'nan') & (names != 'nan')
+            search_index = _build_search_index(codes[valid_mask].tolist(), names[valid_mask].tolist())
+        
+        results = _search_index_lookup(search_index, keyword, limit)
         
         # 排序：代码匹配优先，然后是名称，再按代码排序
         results.sort(key=lambda x: (x['match_type'] != 'code', x['match_type'] != 'name', x['stock_code']))
@@ -262,6 +517,92 @@ def search_stocks_akshare(keyword: str, limit: int = 20) -> Dict[str, Any]:
         else:
             return {'success': False, 'data': [], 'message': f'AKShare搜索失败: {error_msg}', 'error': 'AKSHARE_SEARCH_ERROR'}
 
+# 当前日期字符串缓存，每秒最多重新格式化一次
+_today_str = ''
+_today_stamp = 0.0
+
+def _today():
+    """当前日期（YYYYMMDD），用作行情查询的交易日期"""
+    global _today_str, _today_stamp
+    now = time.monotonic()
+    if not _today_str or now - _today_stamp > 1:
+        _today_str = time.strftime('%Y%m%d')
+        _today_stamp = now
+    return _today_str
+
+# daily接口单次请求的股票数量上限
+TUSHARE_BATCH_SIZE = 50
+# 当日无数据时向前查找最近交易日的自然日天数
+LATEST_PRICE_LOOKBACK_DAYS = 15
+
+# 批量获取股票最新价格
+def get_stock_prices(stock_codes, user_config: Optional[Dict[str, Any]] = None):
+    """
+    批量获取多只股票的最新收盘价
+    
+    Tushare的daily接口支持逗号分隔的多个ts_code，每 TUSHARE_BATCH_SIZE 只股票一次请求；
+    当日无数据（未开盘、停牌等）的股票再批量查询最近 LATEST_PRICE_LOOKBACK_DAYS 天内的最近交易日
+    
+    参数:
+    stock_codes (list): 股票代码列表，例如['600036.SH', '000001.SZ']
+    user_config (dict, optional): 用户配置，包含tushare_token
+    
+    返回:
+    dict: {股票代码: 价格}，查询范围内没有数据的股票不在结果中
+    """
+    if not stock_codes:
+        return {}
+    
+    # 先取缓存，只请求未命中的股票
+    prices = {}
+    for stock_code in stock_codes:
+        cached_price = _price_cache_get(stock_code)
+        if cached_price is not None:
+            prices[stock_code] = cached_price
+    missing_codes = [stock_code for stock_code in stock_codes if stock_code not in prices]
+    if not missing_codes:
+        return prices
+    
+    try:
+        # 获取Tushare Token
+        token = _get_tushare_token(user_config)
+        if token is None:
+            print("⚠️ Tushare Token无效，无法获取股票价格")
+            return prices
+        
+        # 获取当前日期及回看起始日期
+        today = _today()
+        start_date = (datetime.now() - timedelta(days=LATEST_PRICE_LOOKBACK_DAYS)).strftime('%Y%m%d')
+        
+        for start in range(0, len(missing_codes), TUSHARE_BATCH_SIZE):
+            batch = missing_codes[start:start + TUSHARE_BATCH_SIZE]
+            
+            # 获取当日行情数据（只取代码和收盘价）
+            _tushare_bucket.acquire()
+            rows = _tushare_query(token, 'daily', fields='ts_code,close',
+                                  ts_code=','.join(batch), trade_date=today)
+            batch_prices = {row['ts_code']: float(row['close']) for row in rows}
+            
+            # 当日无数据的股票取回看范围内最近一个交易日的收盘价
+            stale_codes = [stock_code for stock_code in batch if stock_code not in batch_prices]
+            if stale_codes:
+                _tushare_bucket.acquire()
+                rows = _tushare_query(token, 'daily', fields='ts_code,trade_date,close',
+                                      ts_code=','.join(stale_codes), start_date=start_date, end_date=today)
+                for row in sorted(rows, key=lambda row: row['trade_date'], reverse=True):
+                    batch_prices.setdefault(row['ts_code'], float(row['close']))
+            
+            for stock_code, price in batch_prices.items():
+                prices[stock_code] = price
+                _price_cache_put(stock_code, price)
+        
+        print(f"✅ 批量获取真实股价: {len(prices)}/{len(stock_codes)} 只")
+        return prices
+    
+    except Exception as e:
+        print(f"批量获取股票价格时出错: {e}")
+        return prices
+
 # 获取股票最新价格
 def get_stock_price(stock_code, user_config: Optional[Dict[str, Any]] = None):
     """
@@ -274,31 +615,36 @@ def get_stock_price(stock_code, user_config: Optional[Dict[str, Any]] = None):
     返回:
     float: 股票当前价格，如获取失败则返回None
     """
+    cached_price = _price_cache_get(stock_code)
+    if cached_price is not None:
+        return cached_price
+    
     try:
-        # 初始化tushare
-        if not init_tushare(user_config):
+        # 获取Tushare Token
+        token = _get_tushare_token(user_config)
+        if token is None:
             print("⚠️ Tushare Token无效，无法获取股票价格")
             return None
         
-        # 创建tushare pro API接口
-        pro = ts.pro_api()
-        
         # 获取当前日期
-        today = datetime.now().strftime('%Y%m%d')
+        today = _today()
         
-        # 获取日线行情数据
-        df = pro.daily(ts_code=stock_code, trade_date=today)
+        # 获取日线行情数据（只取收盘价）
+        _tushare_bucket.acquire()
+        rows = _tushare_query(token, 'daily', fields='close', ts_code=stock_code, trade_date=today)
         
-        if df.empty:
-            # 如果今天没有数据，尝试获取最近的交易日数据
-            df = pro.daily(ts_code=stock_code)
-            if df.empty:
+        if not rows:
+            # 如果今天没有数据，尝试获取最近的交易日数据（按交易日倒序，第一条为最近）
+            _tushare_bucket.acquire()
+            rows = _tushare_query(token, 'daily', fields='close', ts_code=stock_code)
+            if not rows:
                 print(f"❌ 无法获取股票 {stock_code} 的历史数据")
                 return None
             
         # 返回收盘价
-        real_price = float(df.iloc[0]['close'])
+        real_price = float(rows[0]['close'])
         print(f"✅ 获取真实股价: {stock_code} = ¥{real_price}")
+        _price_cache_put(stock_code, real_price)
         return real_price
     
     except Exception as e:
@@ -324,26 +670,23 @@ def validate_tushare_token(token: str, user_config: Optional[Dict[str, Any]] = N
         }
     
     try:
-        # 设置token
-        ts.set_token(token.strip())
-        
-        # 创建API接口
-        pro = ts.pro_api()
+        # 创建该Token对应的API客户端（仅用于本次验证）
+        token = token.strip()
+        pro = ts.pro_api(token)
         
         # 尝试调用一个简单的API来验证token
-        # 使用stock_basic API，获取少量数据
+        # 使用stock_basic API，只取示例所需的几条数据，避免下载整个交易所的列表
         print("🔍 正在验证Tushare Token...")
-        df = pro.stock_basic(exchange='SSE', list_status='L', fields='ts_code,symbol,name')
+        df = pro.stock_basic(exchange='SSE', list_status='L', fields='ts_code,symbol,name', limit=3)
         
         if df is not None and not df.empty:
-            print(f"✅ Tushare Token验证成功，获取到 {len(df)} 条股票数据")
+            print("✅ Tushare Token验证成功")
             return {
                 'valid': True,
                 'message': 'Token验证成功',
                 'details': {
                     'test_api': 'stock_basic',
-                    'sample_count': len(df),
-                    'sample_stocks': df.head(3).to_dict('records') if len(df) > 0 else []
+                    'sample_stocks': df.to_dict('records')
                 }
             }
         else:
@@ -401,7 +744,7 @@ def search_stocks_by_keyword(user_tushare_token: str, keyword: str, limit: int =
         # Tushare Token 验证逻辑 (主要为股价获取等其他依赖Tushare的功能服务)
         # 对于纯AKShare搜索，此处的Token缺失不应直接阻止搜索，但API层可能仍有检查。
         # 如果API层仍检查Token，这里的逻辑需要调整。
-        # 假设API层仍会进行Tushare Token检查，所以我们保留user_config的创建和init_tushare。
+        # 假设API层仍会进行Tushare Token检查，所以这里仍要求传入Token（搜索本身不使用Token）。
         if not user_tushare_token or not user_tushare_token.strip():
             # 如果搜索本身不依赖Tushare Token, 这个错误可以调整
             # 但如果其他操作如股价获取需要，这个检查仍然重要
@@ -412,21 +755,8 @@ def search_stocks_by_keyword(user_tushare_token: str, keyword: str, limit: int =
                 'error': 'TUSHARE_TOKEN_MISSING_FOR_OTHER_FEATURES' # 新的错误码
             }
         
-        user_config = {'tushare_token': user_tushare_token.strip()}
-        if not init_tushare(user_config): # 初始化Tushare主要为后续获取价格等服务
-            print("警告: Tushare初始化失败。搜索将继续使用AKShare，但获取股价等功能可能受影响。")
-            # 即使Tushare初始化失败，也允许AKShare搜索继续
-            # 但需要前端能处理后续获取股价失败的情况
-            # 或者，如果API严格要求Tushare Token有效，这里应该返回错误
-            # return {
-            #     'success': False,
-            #     'data': [],
-            #     'message': 'Tushare Token无效或网络连接失败 (影响股价获取)',
-            #     'error': 'TUSHARE_TOKEN_INVALID_FOR_OTHER_FEATURES' # 新的错误码
-            # }
-
         # 执行 AKShare 搜索
-        akshare_search_result = search_stocks_akshare(keyword.strip(), limit)
+        akshare_search_result = _search_stocks_akshare_normalized(keyword.strip().upper(), limit)
         
         if not akshare_search_result['success']:
             return {
@@ -1,6 +1,9 @@
+import copy
 import json
 import os
 import re
+import threading
+import time
 from datetime import datetime
 
 # 数据文件路径
@@ -10,9 +13,22 @@ WATCHLIST_FILE = os.path.join(DATA_DIR, 'watchlist.json')
 # 确保数据目录存在
 os.makedirs(DATA_DIR, exist_ok=True)
 
-def get_watchlist():
+# 关注列表内存缓存：监控每轮检查和API请求都会读取，短时间内直接返回缓存，
+# save_watchlist 写入时立即失效
+WATCHLIST_CACHE_TTL = 30  # 秒
+_watchlist_cache = None
+_watchlist_cache_time = 0.0
+_watchlist_lock = threading.Lock()
+
+def _invalidate_watchlist_cache():
+    """使关注列表缓存失效"""
+    global _watchlist_cache
+    with _watchlist_lock:
+        _watchlist_cache = None
+
+def _load_watchlist():
     """
-    获取用户关注的股票列表
+    从文件读取关注列表
     
     返回:
     list: 股票列表
@@ -27,6 +43,22 @@ def get_watchlist():
         print(f"读取关注列表出错: {e}")
         return []
 
+def get_watchlist():
+    """
+    获取用户关注的股票列表
+    
+    返回副本，调用方可以自由修改
+    
+    返回:
+    list: 股票列表
+    """
+    global _watchlist_cache, _watchlist_cache_time
+    with _watchlist_lock:
+        if _watchlist_cache is None or time.monotonic() - _watchlist_cache_time >= WATCHLIST_CACHE_TTL:
+            _watchlist_cache = _load_watchlist()
+            _watchlist_cache_time = time.monotonic()
+        return copy.deepcopy(_watchlist_cache)
+
 def save_watchlist(watchlist):
     """
     保存用户关注的股票列表
@@ -44,6 +76,8 @@ def save_watchlist(watchlist):
     except Exception as e:
         print(f"保存关注列表出错: {e}")
         return False
+    finally:
+        _invalidate_watchlist_cache()
 
 def add_stock(stock_data):
     """
@@ -0,0 +1,66 @@
+"""
+database_service 告警日志回放测试
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import database_service, db_pool
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """将数据库指向临时文件，并重置连接与初始化状态"""
+    monkeypatch.setattr(db_pool, 'DB_PATH', str(tmp_path / 'stock_monitor.db'))
+    monkeypatch.setattr(db_pool._local, 'conn', None, raising=False)
+    monkeypatch.setattr(database_service, '_INIT_DONE', False)
+    database_service.init_database()
+    yield
+    db_pool._local.conn.close()
+
+
+def test_replay_skips_rows_with_blank_timestamp(temp_db, tmp_path):
+    csv_path = tmp_path / 'alerts.csv'
+    csv_path.write_text(
+        'stock_code,stock_name,triggered_price,threshold_price,direction,alert_timestamp,user_email\n'
+        '000001.SZ,平安银行,12.5,12.0,UP,2024-05-01 10:00:00,a@x.com\n'
+        '600000.SH,浦发银行,8.0,8.5,DOWN,,a@x.com\n'
+        '000002.SZ,万科A,7.0,7.5,DOWN,2024-05-01 10:05:00,a@x.com\n',
+        encoding='utf-8'
+    )
+
+    assert database_service.replay_alerts_from_file(str(csv_path)) == 2
+
+    logs = database_service.get_alert_logs(user_email='a@x.com')
+    assert sorted(log['stock_code'] for log in logs) == ['000001.SZ', '000002.SZ']
+
+
+def test_replay_keeps_leading_zeros_in_stock_code(temp_db, tmp_path):
+    csv_path = tmp_path / 'alerts.csv'
+    csv_path.write_text(
+        'stock_code,stock_name,triggered_price,threshold_price,direction,alert_timestamp,user_email\n'
+        '000001,平安银行,12.5,12.0,UP,2024-05-01 10:00:00,a@x.com\n',
+        encoding='utf-8'
+    )
+
+    assert database_service.replay_alerts_from_file(str(csv_path)) == 1
+    assert database_service.get_alert_logs(user_email='a@x.com')[0]['stock_code'] == '000001'
+
+
+def test_replay_skips_rows_with_blank_stock_name(temp_db, tmp_path):
+    csv_path = tmp_path / 'alerts.csv'
+    csv_path.write_text(
+        'stock_code,stock_name,triggered_price,threshold_price,direction,alert_timestamp,user_email\n'
+        '000001.SZ,,12.5,12.0,UP,2024-05-01 10:00:00,a@x.com\n'
+        '000002.SZ,万科A,7.0,7.5,DOWN,2024-05-01 10:05:00,a@x.com\n',
+        encoding='utf-8'
+    )
+
+    assert database_service.replay_alerts_from_file(str(csv_path)) == 1
+
+    logs = database_service.get_alert_logs(user_email='a@x.com')
+    assert [log['stock_code'] for log in logs] == ['000002.SZ']
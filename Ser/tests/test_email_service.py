@@ -0,0 +1,64 @@
+"""
+email_service 邮件发送测试
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import email_service
+
+
+class _FakeSMTP:
+    """记录 sendmail 参数的假SMTP连接"""
+
+    sent = []
+
+    def __init__(self, server, port):
+        pass
+
+    def ehlo(self):
+        pass
+
+    def has_extn(self, name):
+        return False
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return 250, b'OK'
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        _FakeSMTP.sent.append((from_addr, to_addrs, msg))
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    _FakeSMTP.sent = []
+    monkeypatch.setattr(email_service.smtplib, 'SMTP', _FakeSMTP)
+    monkeypatch.setattr(email_service, '_smtp_pool', {})
+    monkeypatch.setattr(email_service, '_smtp_key_locks', {})
+    return _FakeSMTP
+
+
+def test_send_email_alert_uses_crlf_line_endings(fake_smtp):
+    user_config = {
+        'email_smtp_server': 'smtp.example.com',
+        'email_smtp_port': 25,
+        'email_smtp_user': 'sender@example.com',
+        'email_smtp_password': 'secret'
+    }
+
+    assert email_service.send_email_alert('to@example.com', '主题', '第一行\n第二行\n', user_config)
+
+    _, to_addrs, msg_bytes = fake_smtp.sent[0]
+    assert to_addrs == ['to@example.com']
+    assert b'\r\n' in msg_bytes
+    assert msg_bytes.count(b'\n') == msg_bytes.count(b'\r\n')
@@ -0,0 +1,50 @@
+"""
+proxy_test_service 代理测试服务测试
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import proxy_test_service
+
+
+class _SlowResponse:
+    status_code = 200
+
+
+class _SlowSession:
+    """每次请求耗时固定的假会话，超过请求的 timeout 时抛出超时"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get(self, url, timeout):
+        if self.delay > timeout:
+            time.sleep(timeout)
+            raise requests.exceptions.Timeout()
+        time.sleep(self.delay)
+        return _SlowResponse()
+
+
+def test_response_time_samples_each_get_their_own_timeout(monkeypatch):
+    # 每次采样耗时为超时的60%：串行共用一个时间预算时第二次采样就会超时
+    monkeypatch.setattr(proxy_test_service, 'RESPONSE_TIME_SAMPLE_TIMEOUT', 0.5)
+
+    result = proxy_test_service._test_response_time(_SlowSession(delay=0.3))
+
+    assert result['success'], result
+    assert len(result['data']['individual_times']) == proxy_test_service.RESPONSE_TIME_SAMPLES
+
+
+def test_response_time_fails_when_a_sample_times_out(monkeypatch):
+    monkeypatch.setattr(proxy_test_service, 'RESPONSE_TIME_SAMPLE_TIMEOUT', 0.1)
+
+    result = proxy_test_service._test_response_time(_SlowSession(delay=0.3))
+
+    assert not result['success']
+    assert result['error'] == '请求超时'